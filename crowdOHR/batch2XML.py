@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Converts many images into XML files by running the image2XML pipeline on a
+pool of worker processes. Each worker imports cv2 once and then converts pages
+until the batch is done. Finished pages are appended to a checkpoint file so an
+interrupted batch can be resumed.
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+import cv2
+
+import image2XML
+import recognitionCache
+
+# image types accepted by cv2.imread, see help of image2XML -i
+IMAGE_EXTENSIONS = ('.bmp', '.dib', '.jpg', '.jpeg', '.jpe', '.jp2', '.png',
+                    '.pbm', '.pgm', '.ppm', '.sr', '.ras', '.tif', '.tiff')
+
+# Command line argument parser
+parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, \
+description='\
+-------------------------------------------------------\n\
+Crowdsourced Offline Handwriting Recognition Prototype.\n\
+-------------------------------------------------------\n\
+Converts a batch of images into XML files. Refer to readme for more information')
+parser.add_argument('-i', dest='input', metavar='', help='source directory, quoted glob pattern, single image or manifest file listing one image path per line', required=True)
+parser.add_argument('-o', dest='output', metavar='', help='destination directory for XML files', required=True)
+parser.add_argument('-j', dest='workers', metavar='', type=int, default=multiprocessing.cpu_count(), help='number of worker processes (default: number of CPUs)')
+parser.add_argument('-q', dest='inFlight', metavar='', type=int, default=0, help='maximum number of pages queued or in progress at once (default: 2 per worker)')
+parser.add_argument('-m', dest='memoryMap', action='store_true', help='keep decoded pages in memory-mapped files, for very large scans')
+parser.add_argument('-s', dest='sidecar', action='store_true', help='save image blocks as JPEG files in a directory next to each XML file instead of inline base64')
+parser.add_argument('-r', dest='cache', metavar='', help='recognition cache file shared by all workers')
+parser.add_argument('-c', dest='checkpoint', metavar='', help='checkpoint file; pages recorded there as done are skipped (default: <output>/checkpoint.tsv)')
+
+def listImages(source):
+    '''Returns the list of image paths described by source.
+    Arguments:
+        source -- a directory, a glob pattern, a single image, or a manifest file
+                  with one path per line. A file is a manifest if it ends in .txt
+                  or is no image cv2 can read. Relative paths in a manifest are
+                  relative to the manifest itself
+    Returns:
+        list of image paths, sorted for directories and globs'''
+
+    if os.path.isdir(source):
+        fileNames = [os.path.join(source, name) for name in os.listdir(source)
+                     if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS]
+        return sorted(fileNames)
+
+    if os.path.isfile(source):
+        # an image given on its own is a batch of one
+        if os.path.splitext(source)[1].lower() != '.txt' and cv2.haveImageReader(source):
+            return [source]
+        root = os.path.dirname(os.path.abspath(source))
+        fileNames = []
+        with open(source) as manifest:
+            for line in manifest:
+                line = line.strip()
+                # skip blank lines and comments
+                if line and not line.startswith('#'):
+                    fileNames.append(os.path.join(root, line))
+        return fileNames
+
+    if glob.escape(source) != source:
+        return sorted(glob.glob(source))
+
+    raise IOError('file not found')
+
+def outputPaths(fileNames, outputDir):
+    '''Maps each input image to an XML file in outputDir. The directory layout
+    below the common parent of all inputs is mirrored so that equal base names
+    in different directories do not overwrite each other.
+    Arguments:
+        fileNames -- list of image paths
+        outputDir -- destination directory
+    Returns:
+        list of XML paths, in the same order as fileNames'''
+
+    if not fileNames:
+        return []
+
+    absNames = [os.path.abspath(name) for name in fileNames]
+    root = os.path.commonpath([os.path.dirname(name) for name in absNames])
+    return [os.path.join(outputDir, os.path.splitext(os.path.relpath(name, root))[0] + '.xml')
+            for name in absNames]
+
+def convertPage(inputFile, outputFile, cache=None, memoryMap=False, sidecar=False):
+    '''Runs the whole image2XML pipeline on one page inside a worker process.
+    The XML file is written under a temporary name and renamed when complete,
+    so a crash never leaves a truncated file behind.
+    Arguments:
+        inputFile -- path of the source image
+        outputFile -- path of the destination XML file
+        cache -- RecognitionCache for block results, or None
+        memoryMap -- keep the decoded page in a memory-mapped file
+        sidecar -- save image blocks as JPEG files next to the XML file
+    Returns:
+        tuple (inputFile, outputFile, ok, seconds, error) where ok is boolean
+        and error is an empty string on success'''
+
+    start = time.time()
+    partFile = outputFile + '.part'
+    try:
+        outputDir = os.path.dirname(outputFile)
+        if outputDir and not os.path.isdir(outputDir):
+            try:
+                os.makedirs(outputDir)
+            except OSError:
+                # another worker may have created it meanwhile
+                if not os.path.isdir(outputDir):
+                    raise
+        # the sidecar directory is named after the final file, not the temporary one
+        image2XML.image2XML(inputFile, partFile, cache, memoryMap=memoryMap,
+                            sidecar=image2XML.sidecarDir(outputFile) if sidecar else False)
+        if cache is not None:
+            # counts of this page reach the database before it is checkpointed
+            cache.flush()
+        os.replace(partFile, outputFile)
+    except Exception as e:
+        if os.path.exists(partFile):
+            os.remove(partFile)
+        return (inputFile, outputFile, False, time.time() - start, '{0}: {1}'.format(type(e).__name__, e))
+    return (inputFile, outputFile, True, time.time() - start, '')
+
+def readCheckpoint(fileName):
+    '''Returns the set of input paths recorded as done in a checkpoint file.
+    Arguments:
+        fileName -- path of the checkpoint file, which may not exist yet
+    Returns:
+        set of input paths'''
+
+    done = set()
+    if not os.path.isfile(fileName):
+        return done
+
+    with open(fileName) as checkpoint:
+        for line in checkpoint:
+            fields = line.rstrip('\n').split('\t')
+            # a line cut short by a crash has fewer fields and is ignored
+            if len(fields) == 5 and fields[0] == 'ok':
+                done.add(fields[1])
+    return done
+
+def writeCheckpoint(checkpoint, result):
+    '''Appends the result of convertPage to an open checkpoint file as a
+    tab separated line: status, input, output, seconds, error'''
+
+    inputFile, outputFile, ok, seconds, error = result
+    error = error.replace('\t', ' ').replace('\n', ' ')
+    checkpoint.write('{0}\t{1}\t{2}\t{3:.3f}\t{4}\n'.format('ok' if ok else 'failed', inputFile, outputFile, seconds, error))
+    checkpoint.flush()
+
+def batch2XML(fileNames, outputDir, workers=None, inFlight=0, checkpointFile=None, cache=None, memoryMap=False, sidecar=False):
+    '''Converts many images into XML files using a pool of worker processes.
+    At most inFlight pages are submitted to the pool at any time, so memory use
+    does not grow with the size of the batch.
+    Arguments:
+        fileNames -- list of image paths
+        outputDir -- destination directory for XML files
+        workers -- number of worker processes, defaults to the number of CPUs
+        inFlight -- maximum number of submitted but unfinished pages, defaults to 2 per worker
+        checkpointFile -- path of the checkpoint file, defaults to outputDir/checkpoint.tsv
+        cache -- RecognitionCache shared by the workers, or None
+        memoryMap -- keep decoded pages in memory-mapped files
+        sidecar -- save image blocks as JPEG files next to each XML file
+    Returns:
+        list of convertPage result tuples for the pages processed by this call'''
+
+    workers = workers or multiprocessing.cpu_count()
+    inFlight = inFlight or 2 * workers
+    if checkpointFile == None:
+        checkpointFile = os.path.join(outputDir, 'checkpoint.tsv')
+    if not os.path.isdir(outputDir):
+        os.makedirs(outputDir)
+
+    # skip pages finished by an earlier run
+    done = readCheckpoint(checkpointFile)
+    pending = [(name, out) for name, out in zip(fileNames, outputPaths(fileNames, outputDir))
+               if os.path.abspath(name) not in done]
+    skipped = len(fileNames) - len(pending)
+    if skipped:
+        print('resuming: {0} page(s) already done'.format(skipped))
+
+    results = []
+    with open(checkpointFile, 'a') as checkpoint, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        queue = iter(pending)
+        exhausted = False
+        broken = False
+        while futures or not (exhausted or broken):
+            # keep the pool fed without queueing the whole batch
+            while not (exhausted or broken) and len(futures) < inFlight:
+                try:
+                    name, out = next(queue)
+                except StopIteration:
+                    exhausted = True
+                else:
+                    futures[pool.submit(convertPage, os.path.abspath(name), out, cache, memoryMap, sidecar)] = (name, out)
+
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, out = futures.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    # a worker died, e.g. killed for memory. Pages still in
+                    # flight fail the same way and are retried on resume
+                    broken = True
+                    result = (os.path.abspath(name), out, False, 0.0, 'BrokenProcessPool: {0}'.format(e))
+                writeCheckpoint(checkpoint, result)
+                results.append(result)
+
+    if broken:
+        print('worker pool terminated abruptly, rerun to resume')
+    return results
+
+def printSummary(results):
+    '''Prints per page failures followed by totals'''
+
+    failed = [result for result in results if not result[2]]
+    for inputFile, outputFile, ok, seconds, error in failed:
+        print('failed: {0}: {1}'.format(inputFile, error))
+
+    seconds = sum(result[3] for result in results)
+    print('{0} page(s) processed, {1} succeeded, {2} failed, {3:.1f} seconds of worker time'.format(
+        len(results), len(results) - len(failed), len(failed), seconds))
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    cache = recognitionCache.RecognitionCache(args.cache, recognizerVersion=image2XML.RECOGNIZER_VERSION) if args.cache else None
+    results = batch2XML(listImages(args.input), args.output, args.workers, args.inFlight, args.checkpoint, cache, args.memoryMap, args.sidecar)
+    printSummary(results)
+    if cache is not None:
+        stats = cache.stats()['total']
+        print('recognition cache: {0} hit(s), {1} miss(es), {2} eviction(s) in total'.format(stats['hits'], stats['misses'], stats['evictions']))
+    sys.exit(1 if any(not result[2] for result in results) else 0)
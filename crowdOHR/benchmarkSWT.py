@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Measures the throughput of swt.detectTextBlocks in megapixels per second on the
+sample images shipped in source/: the miniSVHN set and licensePlates.jpg.
+"""
+
+import os
+import glob
+import time
+import argparse
+import cv2
+
+import swt
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'source')
+
+# Command line argument parser
+parser = argparse.ArgumentParser(description='Benchmark the NumPy stroke width transform text detector')
+parser.add_argument('-r', dest='repeat', metavar='', type=int, default=5, help='number of timed runs per image set (default: 5)')
+parser.add_argument('-s', dest='source', metavar='', default=SOURCE_DIR, help='directory holding miniSVHN and licensePlates.jpg')
+
+def benchmark(images, repeat):
+    '''Times detectTextBlocks over a list of decoded images.
+    Arguments:
+        images -- list of images
+        repeat -- number of timed runs, the fastest is reported
+    Returns:
+        tuple (megapixels, seconds, blocks) for a single run'''
+
+    megapixels = sum(image.shape[0] * image.shape[1] for image in images) / 1e6
+
+    # the first run warms up cv2 and numpy and is not timed
+    blocks = sum(len(swt.detectTextBlocks(image)) for image in images)
+    best = float('inf')
+    for run in range(repeat):
+        start = time.perf_counter()
+        for image in images:
+            swt.detectTextBlocks(image)
+        best = min(best, time.perf_counter() - start)
+    return megapixels, best, blocks
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    imageSets = [
+        ('miniSVHN', sorted(glob.glob(os.path.join(args.source, 'miniSVHN', '*.png')))),
+        ('licensePlates', [os.path.join(args.source, 'licensePlates.jpg')])]
+
+    print('{0:<15}{1:>8}{2:>12}{3:>12}{4:>10}{5:>8}'.format('set', 'images', 'megapixels', 'seconds', 'MP/s', 'blocks'))
+    for name, fileNames in imageSets:
+        images = [cv2.imread(fileName) for fileName in fileNames]
+        megapixels, seconds, blocks = benchmark(images, args.repeat)
+        print('{0:<15}{1:>8}{2:>12.3f}{3:>12.4f}{4:>10.2f}{5:>8}'.format(
+            name, len(images), megapixels, seconds, megapixels / seconds, blocks))
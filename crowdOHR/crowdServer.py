@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Local stand-in for the crowd, used to run hpu.py offline. It answers crowd
+tasks after a configurable delay, returns the blocks it was sent unchanged and
+bills a fixed amount of human time per page and per block.
+"""
+
+import json
+import random
+import asyncio
+import argparse
+
+# Command line argument parser
+parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, \
+description='\
+-------------------------------------------------------\n\
+Crowdsourced Offline Handwriting Recognition Prototype.\n\
+-------------------------------------------------------\n\
+Simulated crowd server for offline testing of HPU dispatch. Refer to readme for more information')
+parser.add_argument('-p', dest='port', metavar='', type=int, default=8100, help='TCP port to listen on (default: 8100)')
+parser.add_argument('-b', dest='host', metavar='', default='127.0.0.1', help='address to bind to (default: 127.0.0.1)')
+parser.add_argument('-l', dest='latency', metavar='', type=float, default=2.0, help='mean seconds before a task is answered (default: 2)')
+parser.add_argument('-j', dest='jitter', metavar='', type=float, default=1.0, help='answers arrive uniformly within latency +/- jitter seconds (default: 1)')
+parser.add_argument('-s', dest='secondsPerBlock', metavar='', type=float, default=4.0, help='human seconds billed per block (default: 4)')
+parser.add_argument('-g', dest='secondsPerPage', metavar='', type=float, default=10.0, help='human seconds billed per page (default: 10)')
+
+class CrowdSimulator(object):
+    '''Answers crowd tasks like a crowd with a fixed latency distribution'''
+
+    def __init__(self, latency=2.0, jitter=1.0, secondsPerBlock=4.0, secondsPerPage=10.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.secondsPerBlock = secondsPerBlock
+        self.secondsPerPage = secondsPerPage
+        self.tasks = 0
+
+    async def answer(self, task):
+        '''Waits out the simulated latency and returns the verified pages'''
+
+        self.tasks += 1
+        await asyncio.sleep(max(0.0, random.uniform(self.latency - self.jitter, self.latency + self.jitter)))
+        return {'pages': [{'id': page['id'],
+                           'blocks': page['blocks'],
+                           'seconds': self.secondsPerPage + self.secondsPerBlock * len(page['blocks'])}
+                          for page in task.get('pages', [])]}
+
+    async def handle(self, reader, writer):
+        '''Serves one HTTP request'''
+
+        try:
+            request = (await reader.readline()).split()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.strip().lower() == 'content-length':
+                    length = int(value)
+
+            if len(request) < 2 or request[0] != b'POST':
+                status, body = '405 Method Not Allowed', b'{}'
+            else:
+                try:
+                    task = json.loads((await reader.readexactly(length)).decode('utf-8'))
+                except ValueError:
+                    status, body = '400 Bad Request', b'{}'
+                else:
+                    status, body = '200 OK', json.dumps(await self.answer(task)).encode('utf-8')
+
+            writer.write((
+                'HTTP/1.1 {0}\r\n'
+                'Content-Type: application/json\r\n'
+                'Content-Length: {1}\r\n'
+                'Connection: close\r\n\r\n').format(status, len(body)).encode('ascii') + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # the client gave up, e.g. on its deadline
+            pass
+        except asyncio.CancelledError:
+            # the server was closed while the task was being answered
+            pass
+        finally:
+            writer.close()
+
+async def startServer(simulator, host='127.0.0.1', port=8100):
+    '''Starts serving crowd tasks on the running event loop.
+    Arguments:
+        simulator -- CrowdSimulator answering the tasks
+        host -- address to bind to
+        port -- TCP port, 0 picks a free one
+    Returns:
+        asyncio server, its bound port is server.sockets[0].getsockname()[1]'''
+
+    return await asyncio.start_server(simulator.handle, host, port)
+
+async def main(args):
+    simulator = CrowdSimulator(args.latency, args.jitter, args.secondsPerBlock, args.secondsPerPage)
+    server = await startServer(simulator, args.host, args.port)
+    print('simulated crowd listening on http://{0}:{1}/'.format(args.host, args.port))
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        pass
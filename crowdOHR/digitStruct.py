@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Ground truth of the Street View House Numbers dataset. digitStruct.mat holds,
+for every image, its file name and one bounding box per digit. The boxes of all
+images are kept in flat NumPy arrays: the boxes of image i are rows
+offsets[i]:offsets[i+1]. The index is saved in the user cache directory,
+$XDG_CACHE_HOME/crowdOHR (~/.cache/crowdOHR by default), under a name derived
+from the path of digitStruct.mat, and loaded from there on later runs. The
+dataset directory is never written to.
+
+digitStruct.mat files saved by MATLAB 5 to 7.x, like the one in miniSVHN, are
+read without extra packages. The full SVHN sets are MATLAB 7.3 (HDF5) files
+and need h5py.
+"""
+
+import os
+import zlib
+import hashlib
+import struct
+import numpy
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+# MAT-file data types and the NumPy types they are stored as
+MAT_TYPES = {1: 'i1', 2: 'u1', 3: 'i2', 4: 'u2', 5: 'i4', 6: 'u4', 7: 'f4', 9: 'f8', 12: 'i8', 13: 'u8'}
+MI_MATRIX = 14
+MI_COMPRESSED = 15
+
+# MAT-file array classes
+CELL_CLASS = 1
+STRUCT_CLASS = 2
+CHAR_CLASS = 4
+
+# field order of the box arrays
+BOX_FIELDS = ('left', 'top', 'width', 'height')
+
+class GroundTruth(object):
+    '''Digit boxes of every image of a dataset in flat arrays'''
+
+    def __init__(self, names, offsets, boxes, labels):
+        '''Arguments:
+            names -- array of image file names
+            offsets -- array of n + 1 integers, the boxes of image i are rows offsets[i]:offsets[i+1]
+            boxes -- m by 4 int32 array of (left, top, width, height)
+            labels -- array of m digit labels'''
+
+        self.names = numpy.asarray(names, dtype=str)
+        self.offsets = numpy.asarray(offsets, dtype=numpy.int64)
+        self.boxes = numpy.asarray(boxes, dtype=numpy.int32).reshape(-1, 4)
+        self.labels = numpy.asarray(labels, dtype=numpy.int8)
+        self.positions = dict((name, i) for i, name in enumerate(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def boxesOf(self, name):
+        '''Returns the boxes of one image as a view'''
+
+        i = self.positions[name]
+        return self.boxes[self.offsets[i]:self.offsets[i + 1]]
+
+    def select(self, names):
+        '''Gathers the boxes of a list of images.
+        Arguments:
+            names -- image file names, each must be in the ground truth
+        Returns:
+            tuple (boxes, imageIds): the boxes in the order of names, and for each
+            box the position of its image in names'''
+
+        images = numpy.array([self.positions[name] for name in names], dtype=numpy.int64)
+        counts = self.offsets[images + 1] - self.offsets[images]
+        imageIds = numpy.repeat(numpy.arange(len(images)), counts)
+        # row of each box: start of its image plus its rank within the image
+        starts = numpy.cumsum(counts) - counts
+        rows = self.offsets[images][imageIds] + numpy.arange(counts.sum()) - starts[imageIds]
+        return self.boxes[rows], imageIds
+
+    def save(self, fileName):
+        # through a file object, numpy would add .npz to other names
+        with open(fileName, 'wb') as indexFile:
+            numpy.savez_compressed(indexFile, names=self.names, offsets=self.offsets, boxes=self.boxes, labels=self.labels)
+
+    @classmethod
+    def load(cls, fileName):
+        with numpy.load(fileName) as index:
+            return cls(index['names'], index['offsets'], index['boxes'], index['labels'])
+
+def cacheDir():
+    '''Returns the directory ground truth indexes are saved in'''
+
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'crowdOHR')
+
+def indexPath(fileName, indexDir=None):
+    '''Returns the path of the saved index of a digitStruct.mat file, named by a
+    hash of its absolute path so the indexes of different datasets never clash'''
+
+    key = hashlib.sha1(os.path.abspath(fileName).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(indexDir or cacheDir(), 'digitStruct-{0}.npz'.format(key))
+
+def loadGroundTruth(fileName, indexDir=None):
+    '''Returns the GroundTruth of a digitStruct.mat file, from its saved index
+    if that is newer than the file.
+    Arguments:
+        fileName -- path of digitStruct.mat
+        indexDir -- directory of saved indexes (default: see cacheDir)
+    Returns:
+        GroundTruth'''
+
+    indexFile = indexPath(fileName, indexDir)
+    if os.path.isfile(indexFile) and os.path.getmtime(indexFile) >= os.path.getmtime(fileName):
+        return GroundTruth.load(indexFile)
+
+    groundTruth = buildIndex(readDigitStruct(fileName))
+    # written under a temporary name, so concurrent runs never read half an index
+    partFile = '{0}.{1}.part'.format(indexFile, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(indexFile), exist_ok=True)
+        groundTruth.save(partFile)
+        os.replace(partFile, indexFile)
+    except OSError as e:
+        # an unwritable cache directory only costs the next run a re-read
+        if os.path.isfile(partFile):
+            os.remove(partFile)
+        print('cannot save ground truth index {0}: {1}'.format(indexFile, e))
+    return groundTruth
+
+def buildIndex(entries):
+    '''Packs a list of (name, boxes, labels) tuples into a GroundTruth'''
+
+    names = [entry[0] for entry in entries]
+    counts = [len(entry[2]) for entry in entries]
+    offsets = numpy.concatenate(([0], numpy.cumsum(counts, dtype=numpy.int64)))
+    boxes = numpy.concatenate([numpy.reshape(entry[1], (-1, 4)) for entry in entries] or [numpy.zeros((0, 4))])
+    labels = numpy.concatenate([numpy.ravel(entry[2]) for entry in entries] or [numpy.zeros(0)])
+    return GroundTruth(names, offsets, numpy.rint(boxes), labels)
+
+def readDigitStruct(fileName):
+    '''Reads the digitStruct variable of a MAT-file.
+    Returns:
+        list of tuple (name, boxes, labels) per image, boxes as rows of (left, top, width, height)'''
+
+    with open(fileName, 'rb') as matFile:
+        header = matFile.read(128)
+
+    # MATLAB 7.3 files are HDF5 files behind a 512 byte header
+    if header.startswith(b'MATLAB 7.3'):
+        return readDigitStructHDF5(fileName)
+
+    entries = []
+    for image in readMat(fileName)['digitStruct']:
+        bbox = image['bbox'] or []
+        boxes = [[float(numpy.ravel(box[field])[0]) for field in BOX_FIELDS] for box in bbox]
+        labels = [float(numpy.ravel(box['label'])[0]) for box in bbox]
+        entries.append((image['name'], boxes, labels))
+    return entries
+
+def readDigitStructHDF5(fileName):
+    '''Reads the digitStruct variable of a MATLAB 7.3 file with h5py'''
+
+    if h5py is None:
+        raise ImportError('h5py is required to read MATLAB 7.3 file ' + fileName)
+
+    entries = []
+    with h5py.File(fileName, 'r') as matFile:
+        group = matFile['digitStruct']
+        nameRefs = group['name'][:].ravel()
+        bboxRefs = group['bbox'][:].ravel()
+
+        def values(bbox, field):
+            # one digit is stored inline, several as references to scalars
+            data = bbox[field]
+            if data.shape[0] == 1:
+                return [float(data[0, 0])]
+            return [float(matFile[ref][0, 0]) for ref in data[:, 0]]
+
+        for nameRef, bboxRef in zip(nameRefs, bboxRefs):
+            name = ''.join(chr(c) for c in matFile[nameRef][:].ravel())
+            bbox = matFile[bboxRef]
+            boxes = numpy.array([values(bbox, field) for field in BOX_FIELDS]).T
+            entries.append((name, boxes, values(bbox, 'label')))
+    return entries
+
+def readMat(fileName):
+    '''Reads the variables of a MATLAB 5 to 7.x MAT-file. Structure arrays are
+    returned as lists of dictionaries, character arrays as strings and numeric
+    arrays as NumPy arrays; empty arrays are None.
+    Returns:
+        dictionary of variables by name'''
+
+    with open(fileName, 'rb') as matFile:
+        data = matFile.read()
+    if data[126:128] == b'IM':
+        endian = '<'
+    elif data[126:128] == b'MI':
+        endian = '>'
+    else:
+        raise ValueError('not a MAT-file: ' + fileName)
+
+    variables = {}
+    position = 128
+    while position < len(data):
+        dataType, payload, position = readElement(data, position, endian)
+        if dataType == MI_COMPRESSED:
+            dataType, payload, _ = readElement(zlib.decompress(payload), 0, endian)
+        if dataType == MI_MATRIX:
+            name, value = readMatrix(payload, endian)
+            variables[name] = value
+    return variables
+
+def readElement(data, position, endian):
+    '''Reads the data element at position.
+    Returns:
+        tuple (dataType, payload, position of the next element)'''
+
+    dataType, size = struct.unpack_from(endian + 'II', data, position)
+    # small elements pack their size into the type and their data into the tag
+    if dataType >> 16:
+        size = dataType >> 16
+        dataType &= 0xffff
+        return dataType, data[position + 4:position + 4 + size], position + 8
+    start = position + 8
+    # compressed elements are not padded to 8 bytes
+    end = start + size if dataType == MI_COMPRESSED else start + (size + 7) // 8 * 8
+    return dataType, data[start:start + size], end
+
+def readNumbers(data, position, endian):
+    '''Reads a numeric data element.
+    Returns:
+        tuple (array, position of the next element)'''
+
+    dataType, payload, position = readElement(data, position, endian)
+    return numpy.frombuffer(payload, dtype=endian + MAT_TYPES[dataType]), position
+
+def readMatrix(payload, endian):
+    '''Reads the contents of a miMATRIX element.
+    Returns:
+        tuple (name, value)'''
+
+    if not payload:
+        return '', None
+
+    flags, position = readNumbers(payload, 0, endian)
+    arrayClass = int(flags[0]) & 0xff
+    dims, position = readNumbers(payload, position, endian)
+    _, name, position = readElement(payload, position, endian)
+    name = name.decode('ascii')
+    count = int(numpy.prod(dims))
+
+    if arrayClass == CELL_CLASS:
+        cells = []
+        for i in range(count):
+            _, element, position = readElement(payload, position, endian)
+            cells.append(readMatrix(element, endian)[1])
+        return name, cells
+
+    if arrayClass == STRUCT_CLASS:
+        fieldLength, position = readNumbers(payload, position, endian)
+        _, fieldNames, position = readElement(payload, position, endian)
+        fieldLength = int(fieldLength[0])
+        fields = [fieldNames[i:i + fieldLength].split(b'\0')[0].decode('ascii')
+                  for i in range(0, len(fieldNames), fieldLength)]
+        elements = []
+        for i in range(count):
+            element = {}
+            for field in fields:
+                _, value, position = readElement(payload, position, endian)
+                element[field] = readMatrix(value, endian)[1]
+            elements.append(element)
+        return name, elements if count else None
+
+    if arrayClass == CHAR_CLASS:
+        dataType, text, position = readElement(payload, position, endian)
+        if dataType in (3, 4):
+            return name, text.decode('utf-16-le' if endian == '<' else 'utf-16-be')
+        return name, text.decode('utf-8')
+
+    values, position = readNumbers(payload, position, endian)
+    if not count:
+        return name, None
+    return name, values.reshape([int(d) for d in dims], order='F')
@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Evaluates the image2XML pipeline on the Street View House Numbers dataset under
+the protocols of source/Main.m, from measurements instead of the stub values of
+ProcessDataset.m:
+
+    CPU      blocks found by getBlocksByCV with SVHN_PARAMETERS
+    CPU+HPU  the CPU blocks, verified by the crowd through hpu.HPUDispatcher
+    HPU      blocks drawn by the crowd alone, sent through hpu.HPUDispatcher
+             without blocks
+
+As in ProcessDataset.m, an image counts as correct when every detected block
+overlaps a ground truth digit box with an IoU above the threshold and every
+digit box is overlapped by a detected block. Cost is the human time billed by
+the crowd, CPU time is reported next to it.
+
+Every stage of the pipeline is timed. The CPU stages (inputImage,
+getBlocksByCV, processBlockList, saveXML) run in worker processes, and each
+image is sent to the crowd server as soon as its CPU blocks are known, which
+is timed as getBlocksByHPU. The crowd server is by default a
+crowdServer.CrowdSimulator started on a free port. The simulated crowd returns
+the blocks it is sent, so with it the HPU points measure the dispatch and
+billing, not human accuracy. A bounded number of images is in progress at once,
+so deadlines are not spent queueing behind the whole dataset. The matching of
+all images is done at once in NumPy. The report is written as JSON and the
+accuracy against cost plot as SVG.
+"""
+
+import os
+import time
+import json
+import asyncio
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy
+
+import hpu
+import image2XML
+import batch2XML
+import crowdServer
+import digitStruct
+
+PROTOCOLS = ('CPU', 'CPU+HPU', 'HPU')
+STAGES = ('inputImage', 'getBlocksByCV', 'getBlocksByHPU', 'processBlockList', 'saveXML')
+
+# swt.detectTextBlocks settings for SVHN: dark digits on light ground are found,
+# and without morphology each digit stays a block of its own
+SVHN_PARAMETERS = {'darkOnLight': True, 'morphologyOpenRadius': 0, 'morphologyCloseRadius': 0}
+
+# Command line argument parser
+parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, \
+description='\
+-------------------------------------------------------\n\
+Crowdsourced Offline Handwriting Recognition Prototype.\n\
+-------------------------------------------------------\n\
+Measures accuracy and cost of image2XML on the SVHN dataset. Refer to readme for more information')
+parser.add_argument('-i', dest='input', metavar='', help='dataset directory holding the PNG images and digitStruct.mat', required=True)
+parser.add_argument('-g', dest='groundTruth', metavar='', help='ground truth file (default: digitStruct.mat in the dataset directory)')
+parser.add_argument('-o', dest='output', metavar='', help='destination directory for XML files of the CPU blocks (default: XML is discarded)')
+parser.add_argument('-t', dest='threshold', metavar='', type=float, default=0.5, help='IoU above which a block matches a digit box (default: 0.5)')
+parser.add_argument('-j', dest='workers', metavar='', type=int, default=None, help='worker processes (default: number of CPUs)')
+parser.add_argument('-u', dest='url', metavar='', help='crowd server URL (default: a simulated crowd)')
+parser.add_argument('-l', dest='latency', metavar='', type=float, default=2.0, help='mean seconds the simulated crowd takes to answer (default: 2)')
+parser.add_argument('-b', dest='batchSize', metavar='', type=int, default=16, help='pages per crowd task (default: 16)')
+parser.add_argument('-q', dest='inFlight', metavar='', type=int, default=256, help='images in progress at once (default: 256)')
+parser.add_argument('-d', dest='deadline', metavar='', type=float, default=300.0, help='seconds until a page the crowd did not answer is scored unverified (default: 300)')
+parser.add_argument('-r', dest='report', metavar='', default='evaluation.json', help='JSON report file (default: evaluation.json)')
+parser.add_argument('-p', dest='plot', metavar='', default='evaluation.svg', help='SVG plot of accuracy against cost (default: evaluation.svg)')
+
+class StageTimer(object):
+    '''Collects the duration of every run of each pipeline stage'''
+
+    def __init__(self):
+        self.durations = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations.setdefault(name, []).append(time.perf_counter() - start)
+
+    def last(self, name):
+        '''Returns the duration of the latest run of a stage'''
+
+        return self.durations[name][-1]
+
+    def merge(self, durations):
+        '''Adds the durations collected by another timer, e.g. in a worker process'''
+
+        for name, values in durations.items():
+            self.durations.setdefault(name, []).extend(values)
+
+    def summary(self):
+        '''Returns a dictionary of run count, total, mean, median, 95th percentile
+        and maximum seconds by stage'''
+
+        summary = {}
+        for name, values in self.durations.items():
+            values = numpy.asarray(values)
+            summary[name] = {'runs': len(values), 'seconds': float(values.sum()),
+                             'mean': float(values.mean()), 'median': float(numpy.median(values)),
+                             'p95': float(numpy.percentile(values, 95)), 'max': float(values.max())}
+        return summary
+
+def evaluateImage(inputFile, outputFile=os.devnull):
+    '''Runs the CPU stages of the pipeline on one image, timing each stage.
+    Arguments:
+        inputFile -- path of the image
+        outputFile -- path of the XML file
+    Returns:
+        tuple (image, blocks, seconds, durations, error, failedBlocks): the
+        decoded image, for the crowd, the CPU blocks, seconds spent finding
+        them, the stage durations of the timer, an error message or None and
+        the number of blocks recognition failed on'''
+
+    timer = StageTimer()
+    errors = []
+    try:
+        with timer.stage('inputImage'):
+            image = image2XML.inputImage(inputFile)
+        with timer.stage('getBlocksByCV'):
+            blocks = image2XML.getBlocksByCV(image, **SVHN_PARAMETERS)
+        # recognizeBlock only knows the sample page yet, it fails on every
+        # SVHN block; those errors are counted instead of printed
+        with timer.stage('processBlockList'):
+            blockList = image2XML.processBlockList(blocks, image, errors=errors, quiet=True)
+        with timer.stage('saveXML'):
+            image2XML.saveXML(blockList, outputFile)
+    except Exception as e:
+        return None, [], 0.0, timer.durations, str(e), len(errors)
+    return image, blocks, timer.last('getBlocksByCV'), timer.durations, None, len(errors)
+
+async def evaluateImages(fileNames, outputFiles, dispatcher, executor, timer, inFlight=256):
+    '''Runs the CPU stages of every image on executor, then sends the image to
+    the crowd twice: with its CPU blocks for CPU+HPU and without blocks for
+    HPU. At most inFlight images are in progress at once, so the deadline of a
+    page is not spent queueing behind the rest of the dataset, and only the
+    images in progress are held in memory.
+    Arguments:
+        fileNames -- list of image paths
+        outputFiles -- path of the XML file of each image
+        dispatcher -- hpu.HPUDispatcher
+        executor -- concurrent.futures executor running evaluateImage
+        timer -- StageTimer collecting the stage durations
+        inFlight -- images in progress at once
+    Returns:
+        list of tuple (blocks, seconds, error, failedBlocks, crowd) per image,
+        as returned by evaluateImage, with crowd a dictionary of tuple
+        (blocks, seconds, verified) by HPU protocol'''
+
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(inFlight)
+
+    async def evaluateOne(fileName, outputFile):
+        async with limit:
+            image, blocks, seconds, durations, error, failedBlocks = \
+                await loop.run_in_executor(executor, evaluateImage, fileName, outputFile)
+            timer.merge(durations)
+            crowd = {'CPU+HPU': (list(blocks), 0.0, False), 'HPU': ([], 0.0, False)}
+            if error is None:
+                try:
+                    with timer.stage('getBlocksByHPU'):
+                        joint, alone = await asyncio.gather(dispatcher.verify(image, blocks),
+                                                            dispatcher.verify(image, []))
+                    crowd = {'CPU+HPU': joint, 'HPU': alone}
+                except Exception as e:
+                    print('FAILED ' + fileName + ': ' + str(e))
+            return (blocks, seconds, error, failedBlocks, crowd)
+
+    return await asyncio.gather(*[evaluateOne(name, out) for name, out in zip(fileNames, outputFiles)])
+
+async def evaluatePipeline(fileNames, outputFiles, executor, timer, url=None, simulator=None, batchSize=16,
+                           deadline=300.0, inFlight=256):
+    '''Runs evaluateImages against a crowd server.
+    Arguments:
+        url -- crowd server URL, or None to start simulator on a free port
+        simulator -- crowdServer.CrowdSimulator (default: its default latency)
+        batchSize -- pages per crowd task
+        deadline -- seconds until an unanswered page is returned unverified
+    Returns:
+        tuple (results of evaluateImages, dispatcher)'''
+
+    server = None
+    if url is None:
+        server = await crowdServer.startServer(simulator or crowdServer.CrowdSimulator(), port=0)
+        url = 'http://127.0.0.1:{0}/'.format(server.sockets[0].getsockname()[1])
+    try:
+        dispatcher = hpu.HPUDispatcher(url, batchSize=batchSize, deadline=deadline)
+        results = await evaluateImages(fileNames, outputFiles, dispatcher, executor, timer, inFlight)
+        await dispatcher.close()
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+    return results, dispatcher
+
+def pairOverlaps(boxes1, boxes2):
+    '''Computes the intersection over union of boxes1[k] and boxes2[k] for every k.
+    Arguments:
+        boxes1 -- n by 4 array of (left, top, width, height)
+        boxes2 -- n by 4 array of (left, top, width, height)
+    Returns:
+        array of n IoU values'''
+
+    boxes1 = numpy.asarray(boxes1, dtype=numpy.float64).reshape(-1, 4)
+    boxes2 = numpy.asarray(boxes2, dtype=numpy.float64).reshape(-1, 4)
+    width = numpy.minimum(boxes1[:, 0] + boxes1[:, 2], boxes2[:, 0] + boxes2[:, 2]) - numpy.maximum(boxes1[:, 0], boxes2[:, 0])
+    height = numpy.minimum(boxes1[:, 1] + boxes1[:, 3], boxes2[:, 1] + boxes2[:, 3]) - numpy.maximum(boxes1[:, 1], boxes2[:, 1])
+    intersection = numpy.clip(width, 0, None) * numpy.clip(height, 0, None)
+    union = boxes1[:, 2] * boxes1[:, 3] + boxes2[:, 2] * boxes2[:, 3] - intersection
+    return numpy.where(union > 0, intersection / numpy.maximum(union, 1e-12), 0.0)
+
+def matchImages(boxes, imageIds, truth, truthIds, images, threshold=0.5):
+    '''Matches the blocks of many images against their ground truth at once.
+    Every block is compared with every digit box of the same image.
+    Arguments:
+        boxes -- k by 4 array of detected (left, top, width, height), grouped by image
+        imageIds -- image of each detected box, non decreasing
+        truth -- m by 4 array of ground truth boxes, grouped by image
+        truthIds -- image of each ground truth box, non decreasing
+        images -- number of images
+        threshold -- IoU above which a block and a digit box match
+    Returns:
+        tuple (correct, boxMatched, truthMatched) of boolean arrays: images whose
+        blocks and digit boxes all match, and detected and ground truth boxes
+        that match at least one box of the other kind'''
+
+    boxes = numpy.asarray(boxes, dtype=numpy.float64).reshape(-1, 4)
+    truth = numpy.asarray(truth, dtype=numpy.float64).reshape(-1, 4)
+    boxCounts = numpy.bincount(imageIds, minlength=images)
+    truthCounts = numpy.bincount(truthIds, minlength=images)
+    boxStarts = numpy.cumsum(boxCounts) - boxCounts
+    truthStarts = numpy.cumsum(truthCounts) - truthCounts
+
+    # enumerate the pairs of every image: pair p of image i is block
+    # p // truthCounts[i] against digit box p % truthCounts[i]
+    pairCounts = boxCounts * truthCounts
+    pairImages = numpy.repeat(numpy.arange(images), pairCounts)
+    pairs = numpy.arange(pairCounts.sum()) - (numpy.cumsum(pairCounts) - pairCounts)[pairImages]
+    boxIndex = boxStarts[pairImages] + pairs // truthCounts[pairImages]
+    truthIndex = truthStarts[pairImages] + pairs % truthCounts[pairImages]
+
+    hits = pairOverlaps(boxes[boxIndex], truth[truthIndex]) > threshold
+    boxMatched = numpy.bincount(boxIndex[hits], minlength=len(boxes)) > 0
+    truthMatched = numpy.bincount(truthIndex[hits], minlength=len(truth)) > 0
+
+    # images without any detected block never count as correct
+    correct = (numpy.bincount(imageIds, weights=~boxMatched, minlength=images) == 0) \
+        & (numpy.bincount(truthIds, weights=~truthMatched, minlength=images) == 0) \
+        & (boxCounts > 0)
+    return correct, boxMatched, truthMatched
+
+def evaluate(fileNames, groundTruth, outputDir=None, threshold=0.5, workers=None, url=None, simulator=None,
+             batchSize=16, deadline=300.0, inFlight=256):
+    '''Runs and scores every protocol on a list of images.
+    Arguments:
+        fileNames -- list of image paths, named as in the ground truth
+        groundTruth -- digitStruct.GroundTruth
+        outputDir -- destination directory for XML files, or None to discard them
+        threshold -- IoU above which a block matches a digit box
+        workers -- worker processes, 1 runs in this process
+        url -- crowd server URL, or None for a simulated crowd
+        simulator -- crowdServer.CrowdSimulator used when url is None
+        batchSize -- pages per crowd task
+        deadline -- seconds until a page the crowd did not answer is scored unverified
+        inFlight -- images in progress at once
+    Returns:
+        report dictionary'''
+
+    start = time.perf_counter()
+    if outputDir:
+        outputFiles = batch2XML.outputPaths(fileNames, outputDir)
+        for directory in set(os.path.dirname(name) for name in outputFiles):
+            os.makedirs(directory, exist_ok=True)
+    else:
+        outputFiles = [os.devnull] * len(fileNames)
+
+    # a single thread runs the CPU stages in this process
+    if workers == 1:
+        executor = ThreadPoolExecutor(max_workers=1)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+    timer = StageTimer()
+    with executor:
+        results, dispatcher = asyncio.run(evaluatePipeline(fileNames, outputFiles, executor, timer, url, simulator,
+                                                           batchSize, deadline, inFlight))
+
+    failures = []
+    for fileName, result in zip(fileNames, results):
+        if result[2] is not None:
+            failures.append({'image': fileName, 'error': result[2]})
+            print('FAILED ' + fileName + ': ' + result[2])
+
+    # blocks, human seconds, CPU seconds and crowd answer of every image by protocol
+    perProtocol = {'CPU': [(result[0], 0.0, result[1], False) for result in results]}
+    for protocol in PROTOCOLS[1:]:
+        perProtocol[protocol] = [(result[4][protocol][0], result[4][protocol][1],
+                                  result[1] if protocol == 'CPU+HPU' else 0.0, result[4][protocol][2])
+                                 for result in results]
+
+    truth, truthIds = groundTruth.select([os.path.basename(name) for name in fileNames])
+    protocols = {}
+    for protocol in PROTOCOLS:
+        perImage = perProtocol[protocol]
+        counts = [len(entry[0]) for entry in perImage]
+        boxes = numpy.array([box for entry in perImage for box in entry[0]], dtype=numpy.float64).reshape(-1, 4)
+        imageIds = numpy.repeat(numpy.arange(len(fileNames)), counts)
+        correct, boxMatched, truthMatched = matchImages(boxes, imageIds, truth, truthIds, len(fileNames), threshold)
+        humanSeconds = sum(entry[1] for entry in perImage)
+        protocols[protocol] = {
+            'accuracy': 100.0 * correct.mean() if len(correct) else 0.0,
+            'precision': 100.0 * boxMatched.mean() if len(boxMatched) else 0.0,
+            'recall': 100.0 * truthMatched.mean() if len(truthMatched) else 0.0,
+            # as in ProcessDataset.m the cost is human time, CPU time is free
+            'cost': humanSeconds,
+            'humanSeconds': humanSeconds,
+            'cpuSeconds': sum(entry[2] for entry in perImage),
+            'verified': sum(1 for entry in perImage if entry[3]),
+            'blocks': len(boxes)}
+
+    return {'images': len(fileNames), 'digits': len(truth), 'threshold': threshold,
+            'seconds': time.perf_counter() - start, 'protocols': protocols,
+            'crowd': {'url': url or 'simulated', 'tasks': dispatcher.crowdTasks, 'pages': dispatcher.pages,
+                      'humanSeconds': dispatcher.humanSeconds, 'timeouts': dispatcher.timeouts,
+                      'failures': dispatcher.failures},
+            'parameters': SVHN_PARAMETERS, 'stages': timer.summary(), 'failures': failures,
+            'failedBlocks': sum(result[3] for result in results)}
+
+def plotSVG(protocols, fileName, width=640, height=480, margin=60):
+    '''Draws the accuracy against cost scatter plot of Main.m as an SVG file.
+    Arguments:
+        protocols -- dictionary of {'accuracy': ..., 'cost': ...} by protocol name
+        fileName -- path of the SVG file
+    Returns:
+        None'''
+
+    # axes as in Main.m: cost from 0 with a 10% margin, accuracy from 0 to 100
+    xmax = max([values['cost'] for values in protocols.values()] + [0]) * 1.1 or 1.0
+    plotWidth = width - 2 * margin
+    plotHeight = height - 2 * margin
+    x = lambda cost: margin + plotWidth * cost / xmax
+    y = lambda accuracy: margin + plotHeight * (1 - accuracy / 100.0)
+
+    lines = ['<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}" font-family="sans-serif" font-size="12">'.format(width, height),
+             '<rect width="100%" height="100%" fill="white"/>',
+             '<path d="M{0} {1} V{2} H{3}" stroke="black" fill="none"/>'.format(margin, margin, height - margin, width - margin)]
+    for i in range(6):
+        cost = xmax * i / 5
+        lines.append('<text x="{0:.1f}" y="{1}" text-anchor="middle">{2:.3g}</text>'.format(x(cost), height - margin + 18, cost))
+        lines.append('<text x="{0}" y="{1:.1f}" text-anchor="end" dy="4">{2}</text>'.format(margin - 6, y(20 * i), 20 * i))
+    lines.append('<text x="{0}" y="{1}" text-anchor="middle">Cost (human seconds)</text>'.format(width // 2, height - 15))
+    lines.append('<text transform="translate(18 {0}) rotate(-90)" text-anchor="middle">Accuracy (%)</text>'.format(height // 2))
+    for name, values in protocols.items():
+        lines.append('<circle cx="{0:.1f}" cy="{1:.1f}" r="5" fill="steelblue"/>'.format(x(values['cost']), y(values['accuracy'])))
+        lines.append('<text x="{0:.1f}" y="{1:.1f}" dy="4">{2}</text>'.format(x(values['cost']) + 9, y(values['accuracy']), name))
+    lines.append('</svg>')
+
+    with open(fileName, 'w') as plotFile:
+        plotFile.write('\n'.join(lines) + '\n')
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    groundTruth = digitStruct.loadGroundTruth(args.groundTruth or os.path.join(args.input, 'digitStruct.mat'))
+
+    # images without ground truth cannot be scored
+    fileNames = batch2XML.listImages(args.input)
+    scored = [name for name in fileNames if os.path.basename(name) in groundTruth.positions]
+    if len(scored) < len(fileNames):
+        print('{0} image(s) without ground truth skipped'.format(len(fileNames) - len(scored)))
+
+    simulator = crowdServer.CrowdSimulator(args.latency, args.latency / 2)
+    report = evaluate(scored, groundTruth, args.output, args.threshold, args.workers, args.url, simulator,
+                      args.batchSize, args.deadline, args.inFlight)
+    with open(args.report, 'w') as reportFile:
+        json.dump(report, reportFile, indent=2)
+    plotSVG(report['protocols'], args.plot)
+
+    print('{0:<10}{1:>10}{2:>11}{3:>8}{4:>14}{5:>12}{6:>10}'.format(
+        'protocol', 'accuracy', 'precision', 'recall', 'human (s)', 'CPU (s)', 'verified'))
+    for protocol in PROTOCOLS:
+        values = report['protocols'][protocol]
+        print('{0:<10}{1:>9.1f}%{2:>10.1f}%{3:>7.1f}%{4:>14.1f}{5:>12.3f}{6:>10}'.format(
+            protocol, values['accuracy'], values['precision'], values['recall'], values['humanSeconds'],
+            values['cpuSeconds'], values['verified']))
+    print('{0} image(s) in {1:.1f} seconds, {2} failed'.format(report['images'], report['seconds'], len(report['failures'])))
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Asynchronous Human Processing Unit (HPU) dispatch. Block verification requests
+from many pages are batched into crowd tasks and sent to a crowd server over
+HTTP, with many tasks in flight at once. A page whose task misses its deadline,
+counted from the request, keeps the blocks found by getBlocksByCV.
+Cost is recorded as seconds of human time, as reported by ProcessDataset.m;
+pages answered after their deadline are not billed.
+
+Crowd task protocol, JSON over HTTP POST:
+    request  {"pages": [{"id": 0, "blocks": [[left, top, width, height], ...], "image": base64 JPEG}, ...]}
+    response {"pages": [{"id": 0, "blocks": [[left, top, width, height], ...], "seconds": 12.5}, ...]}
+
+crowdServer.py is a local stand-in for the crowd with configurable latency.
+"""
+
+import os
+import json
+import base64
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import cv2
+
+import image2XML
+import batch2XML
+import recognitionCache
+
+# Command line argument parser
+parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, \
+description='\
+-------------------------------------------------------\n\
+Crowdsourced Offline Handwriting Recognition Prototype.\n\
+-------------------------------------------------------\n\
+Converts a batch of images into XML files with block verification by the crowd. Refer to readme for more information')
+parser.add_argument('-i', dest='input', metavar='', help='source directory, quoted glob pattern, single image or manifest file listing one image path per line', required=True)
+parser.add_argument('-o', dest='output', metavar='', help='destination directory for XML files', required=True)
+parser.add_argument('-u', dest='url', metavar='', default='http://127.0.0.1:8100/', help='crowd server URL (default: http://127.0.0.1:8100/)')
+parser.add_argument('-b', dest='batchSize', metavar='', type=int, default=16, help='pages per crowd task (default: 16)')
+parser.add_argument('-t', dest='deadline', metavar='', type=float, default=300.0, help='seconds from a request until its page is segmented without the crowd (default: 300)')
+parser.add_argument('-n', dest='maxTasks', metavar='', type=int, default=32, help='crowd tasks in flight at once (default: 32)')
+parser.add_argument('-j', dest='workers', metavar='', type=int, default=4, help='threads for CPU stages (default: 4)')
+parser.add_argument('-c', dest='cache', metavar='', help='recognition cache file, shared by runs and processes')
+parser.add_argument('-q', dest='inFlight', metavar='', type=int, default=256, help='pages in progress at once (default: 256)')
+
+class HPUDispatcher(object):
+    '''Batches block verification requests into crowd tasks.
+    All methods must be called from the event loop that runs the dispatcher.'''
+
+    def __init__(self, url, batchSize=16, batchDelay=0.05, maxTasks=32, deadline=300.0, sendImages=True):
+        '''Arguments:
+            url -- crowd server URL
+            batchSize -- pages per crowd task
+            batchDelay -- seconds to wait for a batch to fill before sending it anyway
+            maxTasks -- crowd tasks in flight at once
+            deadline -- seconds from a request until it is returned unverified
+            sendImages -- include JPEG encoded pages in crowd tasks'''
+
+        parts = urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.path = parts.path or '/'
+        self.batchSize = batchSize
+        self.batchDelay = batchDelay
+        self.deadline = deadline
+        self.sendImages = sendImages
+        self.slots = asyncio.Semaphore(maxTasks)
+        self.pending = []
+        self.timer = None
+        self.tasks = set()
+        self.nextId = 0
+
+        # counters
+        self.humanSeconds = 0.0
+        self.pages = 0
+        self.crowdTasks = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    async def verify(self, image, blocks):
+        '''Sends an image and its CV blocks to the crowd for verification.
+        Arguments:
+            image -- compund list with indexes [row][col][color][intensity]
+            blocks -- list of tuple containing integers (left, top, width, height)
+        Returns:
+            tuple (blocks, seconds, verified) where blocks is the corrected block
+            list, seconds the human time spent and verified is False if the
+            crowd did not answer in time and the given blocks are returned'''
+
+        loop = asyncio.get_running_loop()
+        # the deadline runs from the request, time spent encoding the page or
+        # waiting for a free task slot counts against it
+        expires = loop.time() + self.deadline
+        page = {'id': self.nextId, 'blocks': [list(block) for block in blocks]}
+        self.nextId += 1
+        if self.sendImages:
+            # JPEG encoding is CPU work, keep it off the event loop
+            ok, data = await loop.run_in_executor(None, cv2.imencode, '.jpg', image)
+            if not ok:
+                raise ValueError('cannot encode page for the crowd')
+            page['image'] = base64.b64encode(data).decode('ascii')
+
+        future = loop.create_future()
+        self.pending.append((page, future, blocks, expires))
+        if len(self.pending) >= self.batchSize:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.batchDelay, self.flush)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), max(0.0, expires - loop.time()))
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            # a late answer to this page is neither used nor billed
+            future.cancel()
+            return (list(blocks), 0.0, False)
+
+    def flush(self):
+        '''Sends all pending requests as one crowd task'''
+
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        # pages whose caller gave up before they were sent are dropped
+        batch = [entry for entry in self.pending if not entry[1].done()]
+        self.pending = []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self.dispatch(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def dispatch(self, batch):
+        '''Runs one crowd task and resolves the futures of its pages. The task
+        must be answered before the earliest deadline of its pages; a failed
+        task or a malformed answer resolves every page at once.'''
+
+        loop = asyncio.get_running_loop()
+        answers = {}
+        timedOut = False
+        try:
+            remaining = min(entry[3] for entry in batch) - loop.time()
+            answers = await asyncio.wait_for(self.run(batch), max(0.0, remaining))
+        except asyncio.TimeoutError:
+            timedOut = True
+        except (IOError, ValueError) as e:
+            self.failures += 1
+            print('crowd task failed: {0}'.format(e))
+
+        for page, future, blocks, expires in batch:
+            # the caller may already have given up on this page
+            if future.done():
+                continue
+            answer = answers.get(page['id'])
+            if answer is None:
+                if timedOut:
+                    self.timeouts += 1
+                result = (list(blocks), 0.0, False)
+            else:
+                self.humanSeconds += answer[1]
+                self.pages += 1
+                result = (answer[0], answer[1], True)
+            future.set_result(result)
+
+    async def run(self, batch):
+        '''Sends one crowd task once a task slot is free.
+        Returns:
+            dictionary of tuple (blocks, seconds) by page id
+        Raises:
+            ValueError if any page of the answer is malformed'''
+
+        async with self.slots:
+            self.crowdTasks += 1
+            response = await self.post({'pages': [entry[0] for entry in batch]})
+        answers = {}
+        try:
+            for answer in response['pages']:
+                blocks = [tuple(int(value) for value in block) for block in answer['blocks']]
+                if any(len(block) != 4 for block in blocks):
+                    raise ValueError('block without 4 values')
+                answers[answer['id']] = (blocks, float(answer.get('seconds', 0.0)))
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ValueError('malformed crowd answer: {0}: {1}'.format(type(e).__name__, e))
+        return answers
+
+    async def post(self, payload):
+        '''POSTs a JSON payload to the crowd server and returns the decoded reply'''
+
+        body = json.dumps(payload).encode('utf-8')
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write((
+                'POST {0} HTTP/1.1\r\n'
+                'Host: {1}:{2}\r\n'
+                'Content-Type: application/json\r\n'
+                'Content-Length: {3}\r\n'
+                'Connection: close\r\n\r\n').format(self.path, self.host, self.port, len(body)).encode('ascii') + body)
+            await writer.drain()
+
+            status = (await reader.readline()).split()
+            if len(status) < 2 or status[1] != b'200':
+                raise IOError('crowd server replied ' + b' '.join(status[1:]).decode('latin-1'))
+            while (await reader.readline()).strip():
+                pass
+            return json.loads((await reader.read()).decode('utf-8'))
+        finally:
+            writer.close()
+
+    async def close(self):
+        '''Sends pending requests and waits for all crowd tasks to finish'''
+
+        self.flush()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+async def segmentIntoBlocksAsync(image, dispatcher, executor=None):
+    '''image2XML.segmentIntoBlocks with the crowd as HPU. The blocks found by
+    getBlocksByCV are verified through dispatcher. If the crowd does not answer
+    in time, or the request fails, the CV blocks are kept unverified.
+    Arguments:
+        image -- compund list with indexes [row][col][color][intensity]
+        dispatcher -- HPUDispatcher used for block verification
+        executor -- concurrent.futures executor for CPU stages, or None for the default
+    Returns:
+        tuple (blocks, seconds, verified): the blocks, human time spent and
+        whether the crowd answered'''
+
+    loop = asyncio.get_running_loop()
+    blocks = await loop.run_in_executor(executor, image2XML.getBlocksByCV, image)
+    try:
+        return await dispatcher.verify(image, blocks)
+    except Exception as e:
+        print(e)
+    return (blocks, 0.0, False)
+
+async def image2XMLAsync(inputFile, outputFile, dispatcher, executor=None, cache=None):
+    '''Runs the image2XML pipeline on one page. CPU stages run on executor, so
+    other pages keep being processed while this one waits for the crowd.
+    Arguments:
+        inputFile -- path of the source image
+        outputFile -- path of the destination XML file, or None
+        dispatcher -- HPUDispatcher used for block verification
+        executor -- concurrent.futures executor for CPU stages, or None for the default
+        cache -- RecognitionCache for block results, or None
+    Returns:
+        tuple (seconds, verified): human time spent and whether the crowd answered'''
+
+    loop = asyncio.get_running_loop()
+    image = await loop.run_in_executor(executor, image2XML.inputImage, inputFile)
+    blocks, seconds, verified = await segmentIntoBlocksAsync(image, dispatcher, executor)
+    blockList = await loop.run_in_executor(executor, image2XML.processBlockList, blocks, image, cache)
+    await loop.run_in_executor(executor, image2XML.saveXML, blockList, outputFile)
+    return (seconds, verified)
+
+async def crowd2XML(fileNames, outputDir, dispatcher, workers=4, inFlight=256, cache=None):
+    '''Converts many images with crowd verification, keeping at most inFlight
+    pages in progress.
+    Arguments:
+        fileNames -- list of image paths
+        outputDir -- destination directory for XML files
+        dispatcher -- HPUDispatcher used for block verification
+        workers -- threads for CPU stages
+        inFlight -- pages in progress at once
+        cache -- RecognitionCache for block results, or None
+    Returns:
+        list of tuple (inputFile, ok, seconds, verified, error)'''
+
+    limit = asyncio.Semaphore(inFlight)
+
+    async def convertOne(inputFile, outputFile):
+        async with limit:
+            try:
+                os.makedirs(os.path.dirname(outputFile), exist_ok=True)
+                seconds, verified = await image2XMLAsync(inputFile, outputFile, dispatcher, executor, cache)
+            except Exception as e:
+                return (inputFile, False, 0.0, False, '{0}: {1}'.format(type(e).__name__, e))
+            return (inputFile, True, seconds, verified, '')
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = await asyncio.gather(*[convertOne(name, out)
+            for name, out in zip(fileNames, batch2XML.outputPaths(fileNames, outputDir))])
+        await dispatcher.close()
+    return results
+
+async def main(args):
+    dispatcher = HPUDispatcher(args.url, args.batchSize, maxTasks=args.maxTasks, deadline=args.deadline)
+    fileNames = batch2XML.listImages(args.input)
+    cache = recognitionCache.RecognitionCache(args.cache, recognizerVersion=image2XML.RECOGNIZER_VERSION) if args.cache else None
+    results = await crowd2XML(fileNames, args.output, dispatcher, args.workers, args.inFlight, cache)
+
+    for inputFile, ok, seconds, verified, error in results:
+        if not ok:
+            print('failed: {0}: {1}'.format(inputFile, error))
+    print('{0} page(s), {1} failed, {2} not answered by the crowd in time'.format(
+        len(results), sum(1 for result in results if not result[1]),
+        sum(1 for result in results if result[1] and not result[3])))
+    print('{0} crowd task(s), cost {1:.1f} seconds of human time'.format(dispatcher.crowdTasks, dispatcher.humanSeconds))
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    asyncio.run(main(args))
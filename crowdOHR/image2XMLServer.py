@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Long running image2XML service. cv2, the segmenter and the recognizer are
+loaded and run once on a blank page when the server starts, so each request
+only pays for processing.
+
+POST the contents of an image file and the XML document is returned:
+
+    curl --data-binary @page.jpg http://127.0.0.1:8000/
+    curl --unix-socket /tmp/image2XML.sock --data-binary @page.jpg http://localhost/
+
+GET returns "ok" and can be used as a health check.
+
+The XML document is streamed with chunked transfer encoding, each block as
+soon as it is recognized, so a response is never held in memory as a whole.
+HTTP/1.0 clients get the same stream ended by closing the connection.
+"""
+
+import os
+import stat
+import argparse
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy
+
+import image2XML
+import recognitionCache
+
+# bytes of XML gathered before they are sent as one chunk
+CHUNK_BYTES = 64 * 1024
+
+# Command line argument parser
+parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, \
+description='\
+-------------------------------------------------------\n\
+Crowdsourced Offline Handwriting Recognition Prototype.\n\
+-------------------------------------------------------\n\
+Serves image to XML conversion over HTTP. Refer to readme for more information')
+parser.add_argument('-p', dest='port', metavar='', type=int, default=8000, help='TCP port to listen on (default: 8000)')
+parser.add_argument('-b', dest='host', metavar='', default='127.0.0.1', help='address to bind the TCP port to (default: 127.0.0.1)')
+parser.add_argument('-u', dest='socket', metavar='', help='listen on this Unix socket path instead of a TCP port')
+parser.add_argument('-c', dest='cache', metavar='', help='recognition cache file, may be shared with other processes')
+parser.add_argument('-j', dest='workers', metavar='', type=int, default=1, help='number of blocks recognized in parallel over all requests (default: 1)')
+parser.add_argument('-m', dest='maxBytes', metavar='', type=int, default=64 * 1024 * 1024, help='largest accepted image in bytes (default: 64 MiB)')
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    '''HTTP server on a Unix socket, one thread per connection'''
+
+    daemon_threads = True
+
+    def __init__(self, path, handler):
+        # a socket file left by an earlier server would make bind fail. Anything
+        # else at that path is left alone, it is most likely a mistyped option
+        if os.path.lexists(path):
+            if not stat.S_ISSOCK(os.lstat(path).st_mode):
+                raise IOError('not a socket, refusing to replace: ' + path)
+            os.remove(path)
+        socketserver.UnixStreamServer.__init__(self, path, handler)
+
+class ChunkedWriter(object):
+    '''Text file interface sending what is written as the body of a response,
+    in chunks of about CHUNK_BYTES'''
+
+    def __init__(self, wfile, chunked=True):
+        '''Arguments:
+            wfile -- binary file of the connection
+            chunked -- use chunked transfer encoding, else send the bytes as they are'''
+
+        self.wfile = wfile
+        self.chunked = chunked
+        self.buffer = []
+        self.size = 0
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.buffer.append(data)
+        self.size += len(data)
+        if self.size >= CHUNK_BYTES:
+            self.flush()
+
+    def flush(self):
+        if not self.size:
+            return
+        data = b''.join(self.buffer)
+        self.buffer = []
+        self.size = 0
+        if self.chunked:
+            self.wfile.write('{0:x}\r\n'.format(len(data)).encode('ascii') + data + b'\r\n')
+        else:
+            self.wfile.write(data)
+
+    def close(self):
+        '''Sends what is left and ends the body'''
+
+        self.flush()
+        if self.chunked:
+            self.wfile.write(b'0\r\n\r\n')
+
+class ConvertHandler(BaseHTTPRequestHandler):
+    '''Converts the image in the request body and responds with XML'''
+
+    # chunked responses and persistent connections
+    protocol_version = 'HTTP/1.1'
+
+    # largest accepted request body, recognition cache and the BlockPool shared
+    # by all requests, or None to recognize blocks serially, set by serve()
+    maxBytes = 64 * 1024 * 1024
+    cache = None
+    pool = None
+
+    def address_string(self):
+        # Unix socket peers have no address
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'unix'
+
+    def do_GET(self):
+        self.respond(200, 'text/plain', b'ok\n')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0 or length > self.maxBytes:
+            # the body is left unread, so the connection cannot be reused
+            self.close_connection = True
+            if length <= 0:
+                self.respond(411, 'text/plain', b'image data required\n')
+            else:
+                self.respond(413, 'text/plain', b'image too large\n')
+            return
+
+        data = self.rfile.read(length)
+        try:
+            # decoding and segmentation errors come up here, before any output
+            blocks = image2XML.convertBlocks(data, self.cache, pool=self.pool)
+        except ValueError as e:
+            self.respond(400, 'text/plain', (str(e) + '\n').encode('utf-8'))
+            return
+        except Exception as e:
+            self.respond(500, 'text/plain', (str(e) + '\n').encode('utf-8'))
+            return
+
+        chunked = self.request_version != 'HTTP/1.0'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/xml')
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+
+        output = ChunkedWriter(self.wfile, chunked)
+        try:
+            image2XML.writeXML(blocks, output)
+            output.close()
+        except Exception as e:
+            # the status is sent already; a body cut short without its last
+            # chunk tells the client the response failed
+            self.log_error('conversion failed while streaming: %s', e)
+            self.close_connection = True
+        finally:
+            blocks.close()
+
+    def respond(self, code, contentType, body):
+        self.send_response(code)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(host='127.0.0.1', port=8000, socketPath=None, maxBytes=None, cache=None, workers=1):
+    '''Runs the conversion server until interrupted.
+    Arguments:
+        host -- address to bind when listening on TCP
+        port -- TCP port
+        socketPath -- Unix socket path, used instead of host and port if given
+        maxBytes -- largest accepted image in bytes
+        cache -- RecognitionCache for block results, or None
+        workers -- number of blocks recognized in parallel over all requests
+    Returns:
+        None'''
+
+    if maxBytes:
+        ConvertHandler.maxBytes = maxBytes
+    ConvertHandler.cache = cache
+    # one pool for the whole server, requests share its workers
+    ConvertHandler.pool = image2XML.BlockPool(workers) if workers > 1 else None
+
+    # the first conversion imports and initialises the cv2 modules used by the
+    # pipeline; do it now rather than in the first request. The cache is not
+    # used so the blank page leaves no entries behind
+    image2XML.convert(numpy.full((64, 64, 3), 255, numpy.uint8))
+
+    if socketPath:
+        server = UnixHTTPServer(socketPath, ConvertHandler)
+        print('listening on ' + socketPath)
+    else:
+        server = ThreadingHTTPServer((host, port), ConvertHandler)
+        print('listening on http://{0}:{1}/'.format(host, port))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if ConvertHandler.pool is not None:
+            ConvertHandler.pool.shutdown()
+        if socketPath and os.path.exists(socketPath):
+            os.remove(socketPath)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    cache = recognitionCache.RecognitionCache(args.cache, recognizerVersion=image2XML.RECOGNIZER_VERSION) if args.cache else None
+    serve(args.host, args.port, args.socket, args.maxBytes, cache, args.workers)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Incremental re-processing after an HPU correction round. The corrected block
+list is compared with the previous result: blocks that are unchanged, or moved
+so little that their overlap with an old block stays above a threshold, keep
+their old recognition. Only new or changed blocks are recognized again, and
+the XML lines of kept blocks are copied from the previous output unchanged.
+A kept image block whose box changed is cut again from the image.
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import numpy
+
+import image2XML
+import xmlWriter
+import recognitionCache
+
+# Command line argument parser
+parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, \
+description='\
+-------------------------------------------------------\n\
+Crowdsourced Offline Handwriting Recognition Prototype.\n\
+-------------------------------------------------------\n\
+Updates an XML file after the block list of its image was corrected. Refer to readme for more information')
+parser.add_argument('-i', dest='input', metavar='', help='source image of the XML file', required=True)
+parser.add_argument('-o', dest='output', metavar='', help='XML file to update, created if missing', required=True)
+parser.add_argument('-b', dest='blocks', metavar='', help='JSON file holding the corrected block list [[left, top, width, height], ...]', required=True)
+parser.add_argument('-t', dest='threshold', metavar='', type=float, default=0.9, help='smallest IoU with an old block for its recognition to be kept (default: 0.9)')
+parser.add_argument('-c', dest='cache', metavar='', help='recognition cache file, shared by runs and processes')
+parser.add_argument('-j', dest='workers', metavar='', type=int, default=1, help='number of blocks recognized in parallel (default: 1)')
+parser.add_argument('-s', dest='sidecar', action='store_true', help='save image blocks as JPEG files next to the XML file; by default new image blocks go where the existing XML file has them')
+
+def overlaps(boxes1, boxes2):
+    '''Computes the intersection over union of every pair of boxes.
+    Arguments:
+        boxes1 -- n by 4 array of (left, top, width, height)
+        boxes2 -- m by 4 array of (left, top, width, height)
+    Returns:
+        n by m array of IoU values'''
+
+    boxes1 = numpy.asarray(boxes1, dtype=numpy.float64).reshape(-1, 4)
+    boxes2 = numpy.asarray(boxes2, dtype=numpy.float64).reshape(-1, 4)
+    left = numpy.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+    top = numpy.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+    right = numpy.minimum((boxes1[:, 0] + boxes1[:, 2])[:, None], (boxes2[:, 0] + boxes2[:, 2])[None, :])
+    bottom = numpy.minimum((boxes1[:, 1] + boxes1[:, 3])[:, None], (boxes2[:, 1] + boxes2[:, 3])[None, :])
+    intersection = numpy.clip(right - left, 0, None) * numpy.clip(bottom - top, 0, None)
+    union = (boxes1[:, 2] * boxes1[:, 3])[:, None] + (boxes2[:, 2] * boxes2[:, 3])[None, :] - intersection
+    return numpy.where(union > 0, intersection / numpy.maximum(union, 1e-12), 0.0)
+
+def matchBlocks(oldBlocks, newBlocks, threshold=0.9):
+    '''Pairs each new block with at most one old block. Identical boxes are
+    paired first, then the remaining pairs in order of decreasing IoU.
+    Arguments:
+        oldBlocks -- list of tuple containing integers (left, top, width, height)
+        newBlocks -- list of tuple containing integers (left, top, width, height)
+        threshold -- smallest IoU for a pair
+    Returns:
+        list with the index of the matching old block for each new block, or None'''
+
+    matches = [None] * len(newBlocks)
+    if not oldBlocks or not newBlocks:
+        return matches
+
+    used = set()
+    positions = {}
+    for j, block in enumerate(oldBlocks):
+        positions.setdefault(tuple(block), []).append(j)
+    for i, block in enumerate(newBlocks):
+        candidates = positions.get(tuple(block))
+        if candidates:
+            matches[i] = candidates.pop(0)
+            used.add(matches[i])
+
+    iou = overlaps(newBlocks, oldBlocks)
+    pairs = numpy.argwhere(iou >= threshold)
+    for i, j in pairs[numpy.argsort(-iou[pairs[:, 0], pairs[:, 1]], kind='stable')]:
+        if matches[i] is None and j not in used:
+            matches[i] = int(j)
+            used.add(int(j))
+    return matches
+
+def needsImage(previous, blocks, matches):
+    '''Tells whether any block needs the pixels of the image: a block that is
+    recognized again, or a kept image block whose box changed and is cut again'''
+
+    for block, match in zip(blocks, matches):
+        if match is None:
+            return True
+        if previous[match][1][0] and tuple(previous[match][0]) != tuple(block):
+            return True
+    return False
+
+def reprocessBlockList(previous, blocks, matches, image, cache=None, workers=1, errors=None):
+    '''Builds the processed block list for corrected blocks, reusing results of
+    the previous block list where a block matches an old one. Text is kept for
+    a matched block even if its box moved, an image block is cut again from
+    its new box. Unmatched blocks are recognized with processBlockList.
+    Arguments:
+        previous -- processed blockList [[(left,top,width,height),(isImage, data)], ... ]
+        blocks -- corrected list of tuple containing integers (left, top, width, height)
+        matches -- index of the matching old block for each block, or None, from matchBlocks
+        image -- compund list with indexes [row][col][color][intensity], or None
+                 if needsImage is False
+        cache -- RecognitionCache for block results, or None
+        workers -- number of blocks recognized in parallel
+        errors -- list to which (index, message) is appended for each block that
+                  failed to be recognized, or None
+    Returns:
+        new blockList, compund list containing two tuples [[(left,top,width,height),(isImage, data)], ... ]'''
+
+    positions = [i for i, match in enumerate(matches) if match is None]
+    newErrors = []
+    recognized = image2XML.processBlockList([tuple(blocks[i]) for i in positions], image, cache, workers,
+                                            errors=newErrors) if positions else []
+    if errors is not None:
+        errors.extend((positions[i], error) for i, error in newErrors)
+
+    results = dict(zip(positions, recognized))
+    blockList = []
+    for i, (block, match) in enumerate(zip(blocks, matches)):
+        block = tuple(block)
+        if match is None:
+            blockList.append(results[i])
+        elif previous[match][1][0] and tuple(previous[match][0]) != block:
+            blockList.append((block, (True, image2XML.cropImage(block, image))))
+        else:
+            blockList.append((block, previous[match][1]))
+    return blockList
+
+def sourceOf(line):
+    '''Returns the sidecar file path of a block line, or None'''
+
+    found = re.search(r' src="([^"]*)"', line)
+    return xmlWriter.unescapeAttribute(found.group(1)) if found else None
+
+def patchXML(fileName, blockList, matches, lines, sidecar=None):
+    '''Rewrites an XML file for a new block list. Lines of blocks kept from the
+    previous output are copied as they are, with only the index renumbered if
+    the block moved in the list; the data of those blocks is not formatted again.
+    Image blocks written anew go where the previous output put its images:
+    into its sidecar directory, without overwriting a file a copied line still
+    refers to, or inline. Sidecar files no longer referred to are removed,
+    and so is the sidecar directory once it is empty.
+    Arguments:
+        fileName -- path of the XML file
+        blockList -- new processed blockList
+        matches -- index of the old block each block was taken from, or None
+        lines -- list of tuple ((left,top,width,height), line) of the old blocks
+        sidecar -- True or False to save image blocks as sidecar files or not,
+                   None to do as the previous output did
+    Returns:
+        number of block lines that were written anew'''
+
+    directory = os.path.dirname(fileName)
+    oldSources = [sourceOf(line) for block, line in lines]
+    oldSources = [source for source in oldSources if source]
+    kept = [i for i, (block, match) in enumerate(zip(blockList, matches))
+            if match is not None and tuple(block[0]) == lines[match][0]]
+    keptSources = set(sourceOf(lines[matches[i]][1]) for i in kept) - set([None])
+
+    if sidecar is None:
+        sidecar = bool(oldSources)
+    if not sidecar:
+        sidecarDir = None
+    elif oldSources:
+        sidecarDir = os.path.join(directory, os.path.dirname(oldSources[0]))
+    else:
+        sidecarDir = image2XML.sidecarDir(fileName)
+
+    written = 0
+    partFile = fileName + '.part'
+    with open(partFile, 'w') as outputFile:
+        writer = xmlWriter.XMLWriter(outputFile, sidecarDir,
+                                     [os.path.basename(source) for source in keptSources])
+        writer.begin()
+        keptSet = set(kept)
+        for i, (block, match) in enumerate(zip(blockList, matches)):
+            # a matched box that moved needs its new dimensions written
+            if i in keptSet:
+                line = lines[match][1]
+                if match != i:
+                    line = re.sub(r'^<block index="\d+"', '<block index="' + str(i) + '"', line)
+                writer.writeLine(line)
+            else:
+                writer.writeBlock(i, block)
+                written += 1
+        writer.end()
+    os.replace(partFile, fileName)
+
+    # sidecar files of replaced or dropped blocks are removed, also when the
+    # image blocks are inlined from now on
+    current = set(keptSources)
+    if sidecarDir is not None:
+        current |= set(os.path.basename(sidecarDir) + '/' + name for name in writer.written)
+    for source in set(oldSources) - current:
+        path = os.path.join(directory, source)
+        if os.path.isfile(path):
+            os.remove(path)
+    for oldDir in set(os.path.join(directory, os.path.dirname(source)) for source in oldSources):
+        if os.path.isdir(oldDir) and not os.listdir(oldDir):
+            os.rmdir(oldDir)
+    return written
+
+def updateXML(inputFile, outputFile, blocks, threshold=0.9, cache=None, workers=1, sidecar=None, errors=None):
+    '''Brings an XML file up to date with a corrected block list of its image.
+    Arguments:
+        inputFile -- path of the source image
+        outputFile -- path of the XML file written for an earlier block list, may not exist
+        blocks -- corrected list of tuple containing integers (left, top, width, height)
+        threshold -- smallest IoU with an old block for its result to be kept
+        cache -- RecognitionCache for block results, or None
+        workers -- number of blocks recognized in parallel
+        sidecar -- save image blocks as sidecar files, None to do as the previous output did
+        errors -- list to which (index, message) is appended for each block that
+                  failed to be recognized, or None
+    Returns:
+        tuple (recognized, rewritten): number of blocks recognized again and
+        number of XML lines written anew'''
+
+    previous, lines = image2XML.readXML(outputFile) if os.path.isfile(outputFile) else ([], [])
+    matches = matchBlocks([block[0] for block in previous], blocks, threshold)
+    # when every block is kept as it was the image is not even decoded
+    image = image2XML.inputImage(inputFile) if needsImage(previous, blocks, matches) else None
+    blockList = reprocessBlockList(previous, blocks, matches, image, cache, workers, errors)
+    oldLines = [(block[0], line) for block, line in zip(previous, lines)]
+    rewritten = patchXML(outputFile, blockList, matches, oldLines, sidecar)
+    return (sum(1 for match in matches if match is None), rewritten)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    cache = recognitionCache.RecognitionCache(args.cache, recognizerVersion=image2XML.RECOGNIZER_VERSION) if args.cache else None
+    with open(args.blocks) as blockFile:
+        blocks = [tuple(int(value) for value in block) for block in json.load(blockFile)]
+    errors = []
+    recognized, rewritten = updateXML(args.input, args.output, blocks, args.threshold, cache, args.workers,
+                                      True if args.sidecar else None, errors)
+    print('{0} of {1} block(s) recognized, {2} failed, {3} XML line(s) rewritten'.format(
+        recognized, len(blocks), len(errors), rewritten))
+    sys.exit(1 if errors else 0)
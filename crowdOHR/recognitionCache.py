@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Persistent cache of block recognition results. Results are keyed by a hash of
+the cropped block pixels and the recognizer version, so a block seen before in
+any page, at any position, is not recognized again.
+
+The cache is a SQLite database. Several worker processes and threads may use
+the same file at once; each thread of each process opens its own connection.
+The least recently used entries are evicted when the stored data grows beyond
+the size limit. Hit, miss and eviction counts are kept both per process and in
+the database, where they add up over all processes and runs.
+
+Lookups only read the database. Hit and miss counts and the last use times of
+hit entries are kept in memory and written every FLUSH_OPERATIONS lookups, with
+the next put, by flush() and close(), and when the process exits. Eviction may
+therefore not yet see the most recent hits of other processes.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import multiprocessing.util
+
+# lookups a process counts in memory before writing them to the database
+FLUSH_OPERATIONS = 64
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    isImage INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    lastUsed REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS resultsByLastUsed ON results (lastUsed);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    size INTEGER NOT NULL,
+    hits INTEGER NOT NULL,
+    misses INTEGER NOT NULL,
+    evictions INTEGER NOT NULL);
+INSERT OR IGNORE INTO totals VALUES (0, 0, 0, 0, 0);
+'''
+
+# connections of each thread and counts not yet written, by database file.
+# They belong to the process and are shared by every RecognitionCache of a
+# file, so copies sent to worker processes with each task reuse them
+local = threading.local()
+pendingLock = threading.Lock()
+pending = {}
+pendingPid = None
+
+class PendingCounts(object):
+    '''Hits, misses and last use times of one database not yet written'''
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        # last use time by key of the entries hit
+        self.touched = {}
+
+def connect(fileName):
+    '''Returns the connection of the calling thread to fileName, opening it if needed'''
+
+    if getattr(local, 'pid', None) != os.getpid():
+        # connections of a parent process are not usable after a fork
+        local.connections = {}
+        local.pid = os.getpid()
+    connection = local.connections.get(fileName)
+    if connection is None:
+        # wait for other writers instead of failing, WAL lets readers run alongside
+        connection = sqlite3.connect(fileName, timeout=60, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        local.connections[fileName] = connection
+    return connection
+
+def pendingCounts(fileName):
+    '''Returns the PendingCounts of fileName in this process'''
+
+    global pendingPid
+    with pendingLock:
+        if pendingPid != os.getpid():
+            # counts inherited through a fork belong to the parent
+            pending.clear()
+            pendingPid = os.getpid()
+            # multiprocessing workers exit without running atexit handlers
+            # but run these finalizers, as does the main process at exit
+            multiprocessing.util.Finalize(None, flushAll, exitpriority=10)
+        counts = pending.get(fileName)
+        if counts is None:
+            counts = pending[fileName] = PendingCounts()
+        return counts
+
+def takePending(fileName):
+    '''Removes and returns the pending (hits, misses, touched) of fileName'''
+
+    counts = pendingCounts(fileName)
+    with pendingLock:
+        taken = (counts.hits, counts.misses, counts.touched)
+        counts.hits = counts.misses = 0
+        counts.touched = {}
+    return taken
+
+def restorePending(fileName, taken):
+    '''Adds counts back after takePending when writing them failed'''
+
+    hits, misses, touched = taken
+    counts = pendingCounts(fileName)
+    with pendingLock:
+        counts.hits += hits
+        counts.misses += misses
+        for key, lastUsed in touched.items():
+            counts.touched[key] = max(lastUsed, counts.touched.get(key, 0))
+
+def writePending(connection, taken):
+    '''Writes counts from takePending, inside a write transaction'''
+
+    hits, misses, touched = taken
+    if hits or misses:
+        connection.execute('UPDATE totals SET hits = hits + ?, misses = misses + ? WHERE id = 0', (hits, misses))
+    if touched:
+        connection.executemany('UPDATE results SET lastUsed = max(lastUsed, ?) WHERE key = ?',
+                               [(lastUsed, key) for key, lastUsed in touched.items()])
+
+def flushPending(fileName):
+    '''Writes the pending counts of fileName in one transaction'''
+
+    taken = takePending(fileName)
+    if not (taken[0] or taken[1] or taken[2]):
+        return
+    connection = connect(fileName)
+    try:
+        connection.execute('BEGIN IMMEDIATE')
+        writePending(connection, taken)
+        connection.execute('COMMIT')
+    except Exception:
+        if connection.in_transaction:
+            connection.execute('ROLLBACK')
+        restorePending(fileName, taken)
+        raise
+
+def flushAll():
+    '''Writes the pending counts of every database, run at process exit'''
+
+    with pendingLock:
+        fileNames = list(pending) if pendingPid == os.getpid() else []
+    for fileName in fileNames:
+        try:
+            flushPending(fileName)
+        except sqlite3.Error as e:
+            print('cannot write recognition cache counts to {0}: {1}'.format(fileName, e))
+
+class RecognitionCache(object):
+    '''Size bounded LRU cache of (isImage, data) recognition results on disk'''
+
+    def __init__(self, fileName, maxBytes=1024 * 1024 * 1024, recognizerVersion=''):
+        '''Arguments:
+            fileName -- path of the SQLite database, created if missing
+            maxBytes -- largest total size of cached data before eviction
+            recognizerVersion -- string identifying the recognizer, part of every key'''
+
+        self.fileName = fileName
+        self.maxBytes = maxBytes
+        self.recognizerVersion = recognizerVersion
+        self.lock = threading.Lock()
+
+        # counters for this process
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.connection().executescript(SCHEMA)
+
+    def __getstate__(self):
+        # locks stay in the process that made them
+        state = self.__dict__.copy()
+        del state['lock']
+        state['hits'] = state['misses'] = state['evictions'] = 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def connection(self):
+        '''Returns the connection of the calling thread, opening it if needed'''
+
+        return connect(self.fileName)
+
+    def key(self, block):
+        '''Hashes the pixels of a cropped block and the recognizer version.
+        Arguments:
+            block -- image returned by cropImage, may be a non contiguous view
+        Returns:
+            hex digest string'''
+
+        digest = hashlib.sha256()
+        digest.update(self.recognizerVersion.encode('utf-8'))
+        digest.update(repr((block.shape, str(block.dtype))).encode('ascii'))
+        # rows of a crop are contiguous even when the crop is not
+        for row in block:
+            digest.update(row.tobytes() if not row.flags.c_contiguous else row.data)
+        return digest.hexdigest()
+
+    def get(self, key):
+        '''Returns the cached (isImage, data) tuple for key, or None'''
+
+        # fetchall completes the statement, so no read transaction stays open
+        rows = self.connection().execute('SELECT isImage, data FROM results WHERE key = ?', (key,)).fetchall()
+        counts = pendingCounts(self.fileName)
+        with pendingLock:
+            if rows:
+                counts.hits += 1
+                counts.touched[key] = time.time()
+            else:
+                counts.misses += 1
+            due = counts.hits + counts.misses >= FLUSH_OPERATIONS
+        with self.lock:
+            if rows:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if due:
+            self.flush()
+        return (bool(rows[0][0]), rows[0][1]) if rows else None
+
+    def put(self, key, result):
+        '''Stores an (isImage, data) tuple and evicts old entries if over size'''
+
+        isImage, data = result
+        size = len(data.encode('utf-8'))
+        connection = self.connection()
+        # pending hits are written first so eviction sees their last use
+        taken = takePending(self.fileName)
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            writePending(connection, taken)
+            old = connection.execute('SELECT size FROM results WHERE key = ?', (key,)).fetchall()
+            connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                               (key, int(bool(isImage)), data, size, time.time()))
+            connection.execute('UPDATE totals SET size = size + ? WHERE id = 0', (size - (old[0][0] if old else 0),))
+            evicted = self.evict(connection)
+            connection.execute('COMMIT')
+        except Exception:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            restorePending(self.fileName, taken)
+            raise
+        with self.lock:
+            self.evictions += evicted
+
+    def flush(self):
+        '''Writes the hit and miss counts and last use times held in memory'''
+
+        flushPending(self.fileName)
+
+    def close(self):
+        '''Flushes and closes the connection of the calling thread'''
+
+        self.flush()
+        connection = local.connections.pop(self.fileName, None) if getattr(local, 'pid', None) == os.getpid() else None
+        if connection is not None:
+            connection.close()
+
+    def evict(self, connection):
+        '''Deletes least recently used entries until the total size fits.
+        Must be called inside a write transaction.
+        Returns:
+            number of evicted entries'''
+
+        total = connection.execute('SELECT size FROM totals WHERE id = 0').fetchone()[0]
+        evicted = 0
+        while total > self.maxBytes:
+            rows = connection.execute('SELECT key, size FROM results ORDER BY lastUsed LIMIT 64').fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total <= self.maxBytes:
+                    break
+                connection.execute('DELETE FROM results WHERE key = ?', (key,))
+                total -= size
+                evicted += 1
+        connection.execute('UPDATE totals SET size = ?, evictions = evictions + ? WHERE id = 0', (total, evicted))
+        return evicted
+
+    def stats(self):
+        '''Returns a dictionary with this process's hit, miss and eviction counts,
+        the same counts summed over every user of the database under 'total',
+        and the number of entries and bytes currently stored'''
+
+        self.flush()
+        connection = self.connection()
+        entries = connection.execute('SELECT COUNT(*) FROM results').fetchall()[0][0]
+        size, hits, misses, evictions = connection.execute(
+            'SELECT size, hits, misses, evictions FROM totals WHERE id = 0').fetchall()[0]
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'total': {'hits': hits, 'misses': misses, 'evictions': evictions},
+                    'entries': entries, 'bytes': size}
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Stroke Width Transform text localisation in NumPy. This is a port of
+locate_text/SWT (apply_swt.m and swt_mex.cpp) followed by the connected
+component filtering and grouping steps of source/chen2011.m, so it runs
+wherever cv2 and numpy do.
+
+Instead of marching one ray at a time, all rays of an image advance together:
+each step is an array operation over every ray that has not yet hit an edge or
+left the image.
+"""
+
+import math
+import numpy
+import cv2
+
+# largest gradient value handed to cv2.Canny, which takes int16 derivatives
+CANNY_SCALE = 16000.0
+
+# number of ray steps taken per array operation while marching
+RAY_STEP_CHUNK = 32
+
+def preprocess(image, cannyThreshold=0.15):
+    '''Computes the edge map and smoothed gradients used by the SWT, as in apply_swt.m.
+    Arguments:
+        image -- BGR or grayscale image
+        cannyThreshold -- high Canny threshold as a fraction of the largest gradient
+                          magnitude, the low threshold is 0.4 times this value
+    Returns:
+        tuple (edges, gx, gy): boolean edge map and float32 gradients pointing
+        towards brighter pixels'''
+
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    gray = image.astype(numpy.float32) / 255.0
+
+    # Canny with thresholds relative to the strongest edge, like MATLAB's edge()
+    smooth = cv2.GaussianBlur(gray, (0, 0), math.sqrt(2))
+    dx = cv2.Sobel(smooth, cv2.CV_32F, 1, 0)
+    dy = cv2.Sobel(smooth, cv2.CV_32F, 0, 1)
+    strongest = float(numpy.sqrt(dx * dx + dy * dy).max())
+    if strongest > 0:
+        scale = CANNY_SCALE / strongest
+        edges = cv2.Canny(numpy.rint(dx * scale).astype(numpy.int16),
+                          numpy.rint(dy * scale).astype(numpy.int16),
+                          0.4 * cannyThreshold * CANNY_SCALE, cannyThreshold * CANNY_SCALE,
+                          L2gradient=True) > 0
+    else:
+        edges = numpy.zeros(gray.shape, dtype=bool)
+
+    # Gaussian, Prewitt and median filtered gradients
+    gray = cv2.GaussianBlur(gray, (5, 5), 0.3 * (2.5 - 1) + 0.8)
+    prewitt = numpy.array([[-1, 0, 1], [-1, 0, 1], [-1, 0, 1]], dtype=numpy.float32)
+    gx = cv2.medianBlur(cv2.filter2D(gray, -1, prewitt), 3)
+    gy = cv2.medianBlur(cv2.filter2D(gray, -1, prewitt.T), 3)
+    return edges, gx, gy
+
+def castRays(edges, gx, gy, darkOnLight=False, maxWidth=50, precision=0.25, maxAngle=math.pi / 2):
+    '''Casts a ray from every edge pixel along its gradient until it meets an
+    opposing edge, as strokeWidthTransform in swt_mex.cpp.
+    Arguments:
+        edges -- boolean edge map
+        gx, gy -- gradients pointing towards brighter pixels
+        darkOnLight -- True to look for dark strokes on a light background
+        maxWidth -- rays longer than this many pixels are abandoned
+        precision -- distance in pixels between samples along a ray
+        maxAngle -- largest angle between the ray and the reversed gradient at its end
+    Returns:
+        tuple (rayIds, pixels, lengths): for every pixel crossed by an accepted
+        ray, the ray number and flat pixel index, and the length of each ray'''
+
+    h, w = edges.shape
+    rows, cols = numpy.nonzero(edges)
+    dirX = gx[rows, cols].astype(numpy.float64)
+    dirY = gy[rows, cols].astype(numpy.float64)
+    magnitude = numpy.hypot(dirX, dirY)
+
+    # flat edge pixels have no direction to march in
+    keep = magnitude > 0
+    rows, cols, dirX, dirY, magnitude = rows[keep], cols[keep], dirX[keep], dirY[keep], magnitude[keep]
+    sign = -1.0 if darkOnLight else 1.0
+    dirX = sign * dirX / magnitude
+    dirY = sign * dirY / magnitude
+    startX = cols + 0.5
+    startY = rows + 0.5
+
+    # march every ray together, a block of steps at a time. hitStep is the
+    # first step that lands on another edge pixel, or 0 if none is found
+    steps = int(math.ceil(maxWidth / precision))
+    chunk = min(steps, RAY_STEP_CHUNK)
+    hitStep = numpy.zeros(len(rows), dtype=numpy.int64)
+    active = numpy.arange(len(rows))
+    for first in range(1, steps + 1, chunk):
+        if len(active) == 0:
+            break
+        offsets = numpy.arange(first, min(first + chunk, steps + 1)) * precision
+        x = numpy.floor(startX[active, None] + dirX[active, None] * offsets).astype(numpy.int64)
+        y = numpy.floor(startY[active, None] + dirY[active, None] * offsets).astype(numpy.int64)
+
+        inside = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+        moved = (x != cols[active, None]) | (y != rows[active, None])
+        hit = numpy.zeros(x.shape, dtype=bool)
+        hit[inside] = edges[y[inside], x[inside]]
+        hit &= moved
+
+        # a ray stops at its first hit or when it leaves the image
+        outside = ~inside
+        anyHit = hit.any(axis=1)
+        anyOutside = outside.any(axis=1)
+        firstHit = numpy.where(anyHit, hit.argmax(axis=1), len(offsets))
+        firstOutside = numpy.where(anyOutside, outside.argmax(axis=1), len(offsets))
+        found = anyHit & (firstHit < firstOutside)
+        hitStep[active[found]] = first + firstHit[found]
+        active = active[~(found | anyOutside)]
+
+    # accept rays that end on an edge facing back towards the start
+    rays = numpy.nonzero(hitStep)[0]
+    endX = numpy.floor(startX[rays] + dirX[rays] * hitStep[rays] * precision).astype(numpy.int64)
+    endY = numpy.floor(startY[rays] + dirY[rays] * hitStep[rays] * precision).astype(numpy.int64)
+    endGx = gx[endY, endX].astype(numpy.float64)
+    endGy = gy[endY, endX].astype(numpy.float64)
+    endMagnitude = numpy.hypot(endGx, endGy)
+    endMagnitude[endMagnitude == 0] = numpy.inf
+    cosine = -(dirX[rays] * sign * endGx + dirY[rays] * sign * endGy) / endMagnitude
+    facing = cosine > math.cos(maxAngle)
+    rays, endX, endY = rays[facing], endX[facing], endY[facing]
+    lengths = numpy.hypot(endX - cols[rays], endY - rows[rays])
+
+    # expand accepted rays into the pixels they cross, one sample per step
+    counts = hitStep[rays] + 1
+    rayIds = numpy.repeat(numpy.arange(len(rays)), counts)
+    stepIds = numpy.arange(len(rayIds)) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    sampleX = numpy.floor(startX[rays][rayIds] + dirX[rays][rayIds] * stepIds * precision).astype(numpy.int64)
+    sampleY = numpy.floor(startY[rays][rayIds] + dirY[rays][rayIds] * stepIds * precision).astype(numpy.int64)
+    pixels = sampleY * w + sampleX
+
+    # consecutive samples often fall in the same pixel, keep each pixel once
+    distinct = numpy.ones(len(pixels), dtype=bool)
+    distinct[1:] = (pixels[1:] != pixels[:-1]) | (rayIds[1:] != rayIds[:-1])
+    return rayIds[distinct], pixels[distinct], lengths
+
+def strokeWidthTransform(image, darkOnLight=False, maxWidth=50, precision=0.25):
+    '''Computes the stroke width image, as swt_mex does for apply_swt.m.
+    Arguments:
+        image -- BGR or grayscale image
+        darkOnLight -- True to look for dark strokes on a light background
+        maxWidth -- strokes wider than this many pixels are dropped
+        precision -- distance in pixels between samples along a ray
+    Returns:
+        float32 image holding the stroke width at each stroke pixel and -1 elsewhere'''
+
+    edges, gx, gy = preprocess(image)
+    h, w = edges.shape
+    rayIds, pixels, lengths = castRays(edges, gx, gy, darkOnLight, maxWidth, precision)
+
+    # first pass: each pixel takes the shortest ray crossing it
+    swt = numpy.full(h * w, numpy.inf)
+    numpy.minimum.at(swt, pixels, lengths[rayIds])
+
+    # second pass: clip each ray to its median, as SWTMedianFilter. All
+    # medians come from the first pass values, sorted per ray in one go
+    if len(rayIds):
+        values = swt[pixels]
+        order = numpy.lexsort((values, rayIds))
+        counts = numpy.bincount(rayIds, minlength=len(lengths))
+        starts = numpy.cumsum(counts) - counts
+        used = counts > 0
+        medians = numpy.full(len(lengths), -1.0)
+        medians[used] = values[order][starts[used] + counts[used] // 2]
+        # swt_mex.cpp writes -1 along rays whose median is too wide, which also
+        # erases valid widths of pixels those rays share with others. Such rays
+        # are left out of this pass instead
+        valid = (medians >= 0) & (medians < maxWidth)
+        sampled = valid[rayIds]
+        numpy.minimum.at(swt, pixels[sampled], medians[rayIds[sampled]])
+
+    swt[numpy.isinf(swt)] = -1.0
+    return swt.reshape(h, w).astype(numpy.float32)
+
+def componentStats(labels, count, swt):
+    '''Computes per component statistics in one pass over the labelled pixels.
+    Arguments:
+        labels -- int32 label image, 0 is background
+        count -- number of labels including background
+        swt -- stroke width image
+    Returns:
+        tuple (areas, eccentricities, strokeVariation) indexed by label'''
+
+    rows, cols = numpy.nonzero(labels)
+    ids = labels[rows, cols]
+    widths = swt[rows, cols].astype(numpy.float64)
+    rows = rows.astype(numpy.float64)
+    cols = cols.astype(numpy.float64)
+
+    areas = numpy.bincount(ids, minlength=count).astype(numpy.float64)
+    n = numpy.maximum(areas, 1)
+    meanX = numpy.bincount(ids, cols, count) / n
+    meanY = numpy.bincount(ids, rows, count) / n
+    dX = cols - meanX[ids]
+    dY = rows - meanY[ids]
+
+    # second moments of the region, with the 1/12 pixel term used by regionprops
+    uxx = numpy.bincount(ids, dX * dX, count) / n + 1.0 / 12
+    uyy = numpy.bincount(ids, dY * dY, count) / n + 1.0 / 12
+    uxy = numpy.bincount(ids, dX * dY, count) / n
+    common = numpy.sqrt((uxx - uyy) ** 2 + 4 * uxy ** 2)
+    major = uxx + uyy + common
+    minor = uxx + uyy - common
+    eccentricities = numpy.sqrt(numpy.clip(1 - minor / numpy.maximum(major, 1e-12), 0, 1))
+
+    # coefficient of variation of the stroke width
+    meanWidth = numpy.bincount(ids, widths, count) / n
+    meanSquare = numpy.bincount(ids, widths * widths, count) / n
+    deviation = numpy.sqrt(numpy.maximum(meanSquare - meanWidth ** 2, 0))
+    strokeVariation = deviation / numpy.maximum(meanWidth, 1e-12)
+    return areas, eccentricities, strokeVariation
+
+def solidities(labels, count):
+    '''Computes area over convex hull area for each component.
+    Arguments:
+        labels -- int32 label image, 0 is background
+        count -- number of labels including background
+    Returns:
+        array of solidities indexed by label'''
+
+    result = numpy.ones(count)
+    rows, cols = numpy.nonzero(labels)
+    ids = labels[rows, cols]
+    order = numpy.argsort(ids, kind='stable')
+    ids, rows, cols = ids[order], rows[order], cols[order]
+    bounds = numpy.searchsorted(ids, numpy.arange(count + 1))
+    for label in range(1, count):
+        start, end = bounds[label], bounds[label + 1]
+        if end - start < 3:
+            continue
+        points = numpy.stack((cols[start:end], rows[start:end]), axis=1).astype(numpy.int32)
+        hullArea = cv2.contourArea(cv2.convexHull(points))
+        if hullArea > 0:
+            result[label] = min(1.0, (end - start) / hullArea)
+    return result
+
+def detectTextBlocks(image, darkOnLight=False, maxWidth=50, sizeRange=(50, 5000),
+                     maxEccentricity=0.99, maxStrokeWidthVariation=0.35, solidityRange=(0, 1),
+                     morphologyOpenRadius=25, morphologyCloseRadius=7):
+    '''Finds text regions in an image with the SWT and the filters of chen2011.m.
+    The defaults are those of chen2011.m, including its LightTextOnDark polarity.
+    Candidates are merged into blocks and, as in chen2011.m, only merged blocks
+    larger than sizeRange[1] are kept, which suits lines of text. With both
+    morphology radii 0 every character candidate is returned as its own block,
+    which suits per character ground truth such as SVHN digit boxes.
+    Arguments:
+        image -- BGR or grayscale image
+        darkOnLight -- True for dark text on a light background
+        maxWidth -- strokes wider than this many pixels are dropped
+        sizeRange -- minimum and maximum area of a character candidate
+        maxEccentricity -- largest eccentricity of a character candidate
+        maxStrokeWidthVariation -- largest stroke width standard deviation over mean
+        solidityRange -- allowed solidity, only computed if not (0, 1)
+        morphologyOpenRadius -- radius of the closing that merges characters into blocks
+        morphologyCloseRadius -- radius of the opening that removes thin bridges
+    Returns:
+        list of tuple containing integer block dimensions (left, top, width, height)'''
+
+    swt = strokeWidthTransform(image, darkOnLight, maxWidth)
+
+    # stroke pixels grouped 8-connected, as findLegallyConnectedComponents
+    count, labels = cv2.connectedComponents((swt > 0).astype(numpy.uint8), connectivity=8, ltype=cv2.CV_32S)
+    areas, eccentricities, strokeVariation = componentStats(labels, count, swt)
+    keep = (areas >= sizeRange[0]) & (areas <= sizeRange[1]) \
+        & (eccentricities <= maxEccentricity) \
+        & (strokeVariation <= maxStrokeWidthVariation)
+    if tuple(solidityRange) != (0, 1):
+        solidity = solidities(labels, count)
+        keep &= (solidity >= solidityRange[0]) & (solidity <= solidityRange[1])
+    keep[0] = False
+    candidates = keep[labels].astype(numpy.uint8)
+
+    # merge characters into blocks. chen2011.m closes with the 'open' radius
+    # and opens with the 'close' radius, the same is done here
+    if morphologyOpenRadius:
+        size = 2 * morphologyOpenRadius + 1
+        candidates = cv2.morphologyEx(candidates, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size)))
+    if morphologyCloseRadius:
+        size = 2 * morphologyCloseRadius + 1
+        candidates = cv2.morphologyEx(candidates, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size)))
+
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(candidates, connectivity=8)
+    stats = stats[1:]
+    if morphologyOpenRadius:
+        stats = stats[stats[:, cv2.CC_STAT_AREA] > sizeRange[1]]
+    return [tuple(int(v) for v in row[:4]) for row in stats]
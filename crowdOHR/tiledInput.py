@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Input path for very large scans. A page is held as a memory-mapped array, so
+segmentation, recognition and output only bring into memory the parts of the
+page they read: cropImage slices of a mapped page are views, and reading one
+touches only the rows of that block. Binary PGM files are the only format
+mapped in place. Binary PPM files are turned into BGR a strip of rows at a
+time, and other formats are decoded by cv2 straight into an unlinked
+temporary file when their size can be read from the header (PNG and JPEG).
+cv2 has no region decoder, so a compressed page is still decoded as a whole,
+but its pixels live in the file mapping instead of process memory.
+
+Block detection runs on overlapping tiles of the page. A downscaled pyramid
+level is searched first, decoded at reduced size for JPEG pages, and
+only tiles near its coarse blocks are searched at full resolution. Blocks that
+cross tile seams are merged.
+"""
+
+import os
+import mmap
+import struct
+import weakref
+import tempfile
+import numpy
+import cv2
+
+import swt
+
+# rows converted at a time when copying or downscaling a mapped page
+STRIP_ROWS = 512
+
+# side of the square tiles searched at full resolution. Ray casting in
+# swt.castRays holds arrays of edge pixels times RAY_STEP_CHUNK, so the tile
+# area bounds the memory block detection needs
+TILE_SIZE = 2048
+
+# cv2 flags decoding an image at 1/2, 1/4 and 1/8 of its size. For JPEG files
+# the DCT is scaled, so the full size image is never decoded
+REDUCED_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+class MappedImage(numpy.ndarray):
+    '''Page array returned by openImage. source is the JPEG file the page was
+    decoded from, or None; slices of the page do not keep it'''
+
+    source = None
+
+def openImage(fileName, tempDir=None):
+    '''Returns a page as a read-only memory-mapped BGR (or grayscale) array.
+    Arguments:
+        fileName -- path of the source image
+        tempDir -- directory for the decoded pixels of PPM and compressed
+                   formats, defaults to the system temporary directory
+    Returns:
+        MappedImage with indexes [row][col][color]'''
+
+    if not os.path.isfile(fileName):
+        raise IOError('file not found')
+
+    image = mapNetpbm(fileName, tempDir)
+    source = None
+    if image is None:
+        image = decodeMapped(fileName, tempDir)
+        with open(fileName, 'rb') as imageFile:
+            if imageFile.read(2) == b'\xff\xd8':
+                source = fileName
+    image.flags.writeable = False
+    page = image.view(MappedImage)
+    page.source = source
+    return page
+
+def decodeMapped(fileName, tempDir=None):
+    '''Decodes a compressed image into a temporary mapped file. cv2 decodes into
+    the mapping directly if the size of the image is known beforehand;
+    otherwise, or if the decoded image is of another size (EXIF rotation), the
+    decoded image is copied into the mapping a strip of rows at a time.
+    Returns:
+        numpy array over the mapped file'''
+
+    size = imageSize(fileName)
+    if size is not None:
+        width, height = size
+        mapped = mappedArray((height, width, 3), tempDir)
+        try:
+            decoded = cv2.imread(fileName, mapped)
+        except (TypeError, cv2.error):
+            # cv2 older than 5 cannot decode into a given array
+            decoded = None
+        if decoded is not None and numpy.shares_memory(decoded, mapped):
+            return mapped
+        del mapped
+    else:
+        decoded = None
+
+    if decoded is None:
+        decoded = cv2.imread(fileName)
+    if decoded is None:
+        raise IOError('cannot decode image: ' + fileName)
+    mapped = mappedArray(decoded.shape, tempDir)
+    for top in range(0, decoded.shape[0], STRIP_ROWS):
+        mapped[top:top + STRIP_ROWS] = decoded[top:top + STRIP_ROWS]
+    return mapped
+
+def mappedArray(shape, tempDir=None):
+    '''Returns a writable uint8 array over a new temporary file. The file is
+    unlinked at once; Windows cannot remove a mapped file, so there it is
+    removed when the mapping is closed, or at exit at the latest.'''
+
+    handle, path = tempfile.mkstemp(suffix='.raw', dir=tempDir)
+    buffer = None
+    try:
+        os.ftruncate(handle, int(numpy.prod(shape)))
+        buffer = mmap.mmap(handle, 0)
+    finally:
+        os.close(handle)
+        if buffer is None:
+            os.remove(path)
+    try:
+        os.remove(path)
+    except OSError:
+        weakref.finalize(buffer, removeFile, path)
+    return numpy.ndarray(shape, numpy.uint8, buffer)
+
+def removeFile(path):
+    '''Removes a file, if it still can'''
+
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def imageSize(fileName):
+    '''Reads the size of a PNG or JPEG image from its header.
+    Returns:
+        tuple (width, height), or None for other formats'''
+
+    with open(fileName, 'rb') as imageFile:
+        header = imageFile.read(24)
+        if header[:8] == b'\x89PNG\r\n\x1a\n' and header[12:16] == b'IHDR':
+            return struct.unpack('>II', header[16:24])
+        if header[:2] != b'\xff\xd8':
+            return None
+
+        # walk the JPEG segments up to the start of frame
+        imageFile.seek(2)
+        while True:
+            marker = imageFile.read(4)
+            if len(marker) < 4 or marker[0] != 0xff:
+                return None
+            if marker[1] == 0xff:
+                # fill bytes before a marker
+                imageFile.seek(-3, os.SEEK_CUR)
+                continue
+            length = struct.unpack('>H', marker[2:])[0]
+            if 0xc0 <= marker[1] <= 0xcf and marker[1] not in (0xc4, 0xc8, 0xcc):
+                frame = imageFile.read(5)
+                if len(frame) < 5:
+                    return None
+                height, width = struct.unpack('>HH', frame[1:])
+                return (width, height)
+            imageFile.seek(length - 2, os.SEEK_CUR)
+
+def readNetpbmHeader(imageFile):
+    '''Reads the header of a binary PGM (P5) or PPM (P6) file. The header is
+    read field by field, so comments of any length are skipped.
+    Returns:
+        tuple (kind, width, height, maxValue, offset of the pixels), or None if
+        the file is of another kind'''
+
+    kind = imageFile.read(2)
+    if kind not in (b'P5', b'P6'):
+        return None
+
+    fields = []
+    field = b''
+    # the single whitespace byte ending the last field separates the header
+    # from the pixels
+    while len(fields) < 3:
+        character = imageFile.read(1)
+        if not character:
+            raise IOError('truncated image header')
+        if character.isspace() or character == b'#':
+            if field:
+                fields.append(int(field))
+                field = b''
+            if character == b'#':
+                # a comment runs to the end of its line
+                imageFile.readline()
+        elif character.isdigit():
+            field += character
+        else:
+            raise IOError('malformed image header')
+    width, height, maxValue = fields
+    return (kind, width, height, maxValue, imageFile.tell())
+
+def mapNetpbm(fileName, tempDir=None):
+    '''Maps the pixels of a binary PGM (P5) or PPM (P6) file with 8 bit
+    samples. PGM pixels are mapped in place, without decoding. PPM stores RGB,
+    which is turned into BGR in a temporary mapped file a strip of rows at a
+    time: a reversed channel view would have a negative stride, and cv2 copies
+    such arrays whole.
+    Returns:
+        numpy array in BGR order, or None if the file is of another kind'''
+
+    with open(fileName, 'rb') as imageFile:
+        header = readNetpbmHeader(imageFile)
+    if header is None:
+        return None
+    kind, width, height, maxValue, offset = header
+    if maxValue > 255:
+        return None
+
+    if kind == b'P5':
+        return numpy.memmap(fileName, dtype=numpy.uint8, mode='r', offset=offset, shape=(height, width))
+    rgb = numpy.memmap(fileName, dtype=numpy.uint8, mode='r', offset=offset, shape=(height, width, 3))
+    bgr = mappedArray(rgb.shape, tempDir)
+    for top in range(0, height, STRIP_ROWS):
+        bgr[top:top + STRIP_ROWS] = rgb[top:top + STRIP_ROWS, :, ::-1]
+    return bgr
+
+def pyramidLevel(image, factor):
+    '''Downscales an image by an integer factor. A page decoded from a JPEG
+    file is decoded again at reduced size where cv2 can; otherwise the
+    page is downscaled a strip of rows at a time, so a mapped page is never
+    read into memory as a whole.
+    Arguments:
+        image -- image array, may be memory-mapped
+        factor -- integer downscaling factor
+    Returns:
+        downscaled image'''
+
+    source = getattr(image, 'source', None)
+    if source is not None and factor in REDUCED_FLAGS:
+        level = cv2.imread(source, REDUCED_FLAGS[factor])
+        if level is not None:
+            return level
+
+    height, width = image.shape[:2]
+    levelWidth = max(1, width // factor)
+    strip = max(factor, STRIP_ROWS // factor * factor)
+    strips = []
+    for top in range(0, height, strip):
+        rows = numpy.ascontiguousarray(image[top:top + strip])
+        levelRows = max(1, rows.shape[0] // factor)
+        strips.append(cv2.resize(rows, (levelWidth, levelRows), interpolation=cv2.INTER_AREA))
+    return numpy.concatenate(strips, axis=0)
+
+def tileOrigins(length, tileSize, overlap):
+    '''Returns the start offsets of tiles covering length with the given overlap'''
+
+    step = max(1, tileSize - overlap)
+    origins = list(range(0, max(1, length - overlap), step))
+    # the last tile ends at the border instead of hanging over it
+    if origins[-1] + tileSize < length:
+        origins.append(length - tileSize)
+    return origins
+
+def intersecting(boxes1, boxes2, gap=0):
+    '''Tests every pair of (left, top, width, height) boxes for overlap.
+    Returns:
+        n by m boolean array, True where boxes overlap or are at most gap pixels apart'''
+
+    boxes1 = numpy.asarray(boxes1, dtype=numpy.int64).reshape(-1, 4)
+    boxes2 = numpy.asarray(boxes2, dtype=numpy.int64).reshape(-1, 4)
+    return (boxes1[:, None, 0] <= (boxes2[:, 0] + boxes2[:, 2] + gap)[None, :]) \
+        & (boxes2[None, :, 0] <= (boxes1[:, 0] + boxes1[:, 2] + gap)[:, None]) \
+        & (boxes1[:, None, 1] <= (boxes2[:, 1] + boxes2[:, 3] + gap)[None, :]) \
+        & (boxes2[None, :, 1] <= (boxes1[:, 1] + boxes1[:, 3] + gap)[:, None])
+
+def mergeSeams(boxes, tiles):
+    '''Merges blocks found in different tiles that overlap, which are parts or
+    duplicates of one block crossing a tile seam.
+    Arguments:
+        boxes -- list of tuple containing integers (left, top, width, height)
+        tiles -- index of the tile each box was found in
+    Returns:
+        list of merged boxes'''
+
+    if not boxes:
+        return []
+
+    # union-find over overlapping boxes of different tiles
+    parent = list(range(len(boxes)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    tiles = numpy.asarray(tiles)
+    pairs = numpy.argwhere(intersecting(boxes, boxes) & (tiles[:, None] != tiles[None, :]))
+    for i, j in pairs:
+        parent[find(i)] = find(j)
+
+    groups = {}
+    for i, box in enumerate(boxes):
+        left, top, width, height = box
+        group = groups.setdefault(find(i), [left, top, left + width, top + height])
+        group[0] = min(group[0], left)
+        group[1] = min(group[1], top)
+        group[2] = max(group[2], left + width)
+        group[3] = max(group[3], top + height)
+    return sorted((left, top, right - left, bottom - top) for left, top, right, bottom in groups.values())
+
+def detectBlocksTiled(image, tileSize=TILE_SIZE, overlap=256, factor=4, detect=swt.detectTextBlocks):
+    '''Finds text blocks of a large page with bounded memory.
+    Arguments:
+        image -- page array, usually memory-mapped
+        tileSize -- side of the square tiles searched at full resolution
+        overlap -- pixels shared by neighbouring tiles, at least the height of a text line
+        factor -- downscaling factor of the pyramid level used for coarse detection,
+                  1 searches every tile
+        detect -- block detector taking an image and returning (left, top, width, height) boxes
+    Returns:
+        list of tuple containing integer block dimensions (left, top, width, height)'''
+
+    height, width = image.shape[:2]
+
+    # coarse blocks, scaled back up and padded by a tile overlap. If the
+    # coarse level shows no block at all, every tile is searched
+    regions = None
+    if factor > 1:
+        coarse = detect(pyramidLevel(image, factor))
+        if coarse:
+            regions = [(left * factor - overlap, top * factor - overlap,
+                        (w + 1) * factor + 2 * overlap, (h + 1) * factor + 2 * overlap)
+                       for left, top, w, h in coarse]
+
+    boxes = []
+    tiles = []
+    origins = [(x, y) for y in tileOrigins(height, tileSize, overlap) for x in tileOrigins(width, tileSize, overlap)]
+    for tile, (x, y) in enumerate(origins):
+        # skip tiles holding no coarse block
+        if regions is not None and not intersecting([(x, y, tileSize, tileSize)], regions).any():
+            continue
+        found = detect(numpy.ascontiguousarray(image[y:y + tileSize, x:x + tileSize]))
+        boxes.extend((left + x, top + y, w, h) for left, top, w, h in found)
+        tiles.extend([tile] * len(found))
+    return mergeSeams(boxes, tiles)
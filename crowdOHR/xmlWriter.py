@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Streaming XML writer for processed blocks. Each block is written as soon as it
+is handed over, with its attributes escaped, so a page never has to be held in
+memory as a whole. Image blocks may be given as the image returned by
+cropImage; they are JPEG encoded straight from that view when written, and the
+JPEG is written out in base64 chunks, or to a sidecar file next to the XML.
+"""
+
+import os
+import base64
+import numpy
+import cv2
+
+# raw bytes per base64 chunk, a multiple of 3 so chunks join without padding
+BASE64_CHUNK = 3 * 16384
+
+# characters escaped in attribute values; newlines and tabs are kept as
+# character references because parsers turn them into spaces otherwise
+ATTRIBUTE_ENTITIES = (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;'),
+                      ('\n', '&#10;'), ('\r', '&#13;'), ('\t', '&#9;'))
+
+def escapeAttribute(value):
+    '''Returns value escaped for use inside a double quoted XML attribute'''
+
+    for character, entity in ATTRIBUTE_ENTITIES:
+        value = value.replace(character, entity)
+    return value
+
+def unescapeAttribute(value):
+    '''Reverses escapeAttribute'''
+
+    for character, entity in reversed(ATTRIBUTE_ENTITIES):
+        value = value.replace(entity, character)
+    return value
+
+def encodeImage(block, quality=90):
+    '''JPEG encodes a block image. cv2 reads the rows of a cropImage view in
+    place, so no contiguous copy of the pixels is made.
+    Arguments:
+        block -- image returned by cropImage
+        quality -- JPEG quality from 0 to 100
+    Returns:
+        numpy uint8 array holding the JPEG file'''
+
+    ok, data = cv2.imencode('.jpg', block, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError('cannot encode image block')
+    return data
+
+class XMLWriter(object):
+    '''Writes blocks to an open text file one at a time'''
+
+    def __init__(self, outputFile, sidecarDir=None, reserved=()):
+        '''Arguments:
+            outputFile -- file object opened for writing text
+            sidecarDir -- if given, image blocks are saved as JPEG files in this
+                          directory and referenced by a src attribute instead of
+                          being inlined as base64 data
+            reserved -- names of files in sidecarDir still referenced by lines
+                        this writer copies, which it must not overwrite'''
+
+        self.outputFile = outputFile
+        self.sidecarDir = sidecarDir
+        self.reserved = set(reserved)
+        # names of the sidecar files written
+        self.written = []
+
+    def begin(self):
+        self.outputFile.write('<?xml version="1.0"?>\n<blocks>\n')
+
+    def end(self):
+        self.outputFile.write('</blocks>\n')
+
+    def writeLine(self, line):
+        '''Writes an already formatted block line as it is'''
+
+        self.outputFile.write(line)
+
+    def writeBlock(self, index, block):
+        '''Writes one block.
+        Arguments:
+            index -- position of the block in blockList
+            block -- tuple ((left,top,width,height),(isImage, data)) where data is
+                     text, base64 image data, or for image blocks the block image
+        Returns:
+            None'''
+
+        (left, top, width, height), (isImage, data) = block
+        write = self.outputFile.write
+        write('<block index="{0}" left="{1}" top="{2}" width="{3}" height="{4}" isImage="{5}"'.format(
+            index, left, top, width, height, bool(isImage)))
+
+        if not isImage:
+            write(' data="' + escapeAttribute(data) + '"/>\n')
+            return
+
+        if self.sidecarDir is not None:
+            name = self.writeSidecar(index, data)
+            write(' src="' + escapeAttribute(name) + '"/>\n')
+            return
+
+        # base64 never needs escaping. An image is encoded and written a chunk
+        # at a time, so its base64 text never exists as a whole
+        write(' data="')
+        if isinstance(data, numpy.ndarray):
+            jpeg = memoryview(encodeImage(data)).cast('B')
+            for start in range(0, len(jpeg), BASE64_CHUNK):
+                write(base64.b64encode(jpeg[start:start + BASE64_CHUNK]).decode('ascii'))
+        else:
+            write(data)
+        write('"/>\n')
+
+    def writeSidecar(self, index, data):
+        '''Saves an image block as a JPEG file in the sidecar directory.
+        Returns:
+            path of the file relative to the directory of the XML file'''
+
+        if not os.path.isdir(self.sidecarDir):
+            os.makedirs(self.sidecarDir)
+        name = 'block{0}.jpg'.format(index)
+        suffix = 0
+        while name in self.reserved:
+            suffix += 1
+            name = 'block{0}_{1}.jpg'.format(index, suffix)
+        self.reserved.add(name)
+        self.written.append(name)
+        with open(os.path.join(self.sidecarDir, name), 'wb') as imageFile:
+            if isinstance(data, numpy.ndarray):
+                imageFile.write(encodeImage(data))
+            else:
+                imageFile.write(base64.b64decode(data))
+        return os.path.basename(self.sidecarDir) + '/' + name
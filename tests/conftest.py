@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+The crowdOHR modules import each other by name, so their directory is put on
+the path the same way running them as scripts does.
+"""
+
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'crowdOHR'))
+
+# the scanned letter the test values of image2XML.recognizeBlock belong to
+SAMPLE_PAGE = os.path.join(ROOT, 'third_party', 'samples', 'unprocessed1.jpg')
+MINI_SVHN = os.path.join(ROOT, 'source', 'miniSVHN')
+
+def sameBlocks(blockList, other):
+    '''Compares block lists whose image blocks may hold block images'''
+
+    if len(blockList) != len(other):
+        return False
+    for (dimensions, (isImage, data)), (otherDimensions, (otherIsImage, otherData)) in zip(blockList, other):
+        if tuple(dimensions) != tuple(otherDimensions) or isImage != otherIsImage:
+            return False
+        if hasattr(data, 'shape') or hasattr(otherData, 'shape'):
+            if not (hasattr(data, 'shape') and hasattr(otherData, 'shape')) or \
+                    data.shape != otherData.shape or (data != otherData).any():
+                return False
+        elif data != otherData:
+            return False
+    return True
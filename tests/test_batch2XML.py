@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Tests of the batch driver: checkpoint parsing and resuming a batch.
+"""
+
+import os
+import shutil
+
+import batch2XML
+from conftest import SAMPLE_PAGE
+
+def makePages(directory, count):
+    os.makedirs(directory)
+    fileNames = []
+    for i in range(count):
+        fileName = os.path.join(directory, 'page{0}.jpg'.format(i))
+        shutil.copy(SAMPLE_PAGE, fileName)
+        fileNames.append(fileName)
+    return fileNames
+
+def test_listImagesTellsImagesFromManifests(tmp_path):
+    pages = makePages(str(tmp_path / 'pages'), 2)
+    assert batch2XML.listImages(pages[0]) == [pages[0]]
+    # an image without an image extension is still read as an image
+    shutil.copy(pages[0], str(tmp_path / 'scan'))
+    assert batch2XML.listImages(str(tmp_path / 'scan')) == [str(tmp_path / 'scan')]
+    for name in ('list.txt', 'list'):
+        manifest = tmp_path / name
+        manifest.write_text('# pages\npages/page1.jpg\n\npages/page0.jpg\n')
+        assert batch2XML.listImages(str(manifest)) == [os.path.join(str(tmp_path), 'pages', 'page1.jpg'),
+                                                      os.path.join(str(tmp_path), 'pages', 'page0.jpg')]
+    assert batch2XML.listImages(str(tmp_path / 'pages' / 'page*.jpg')) == pages
+    assert batch2XML.listImages(str(tmp_path / 'pages')) == pages
+
+def test_readCheckpointIgnoresFailedAndTruncatedLines(tmp_path):
+    checkpoint = tmp_path / 'checkpoint.tsv'
+    checkpoint.write_text('ok\t/a.jpg\t/a.xml\t1.000\t\n'
+                          'failed\t/b.jpg\t/b.xml\t0.500\tIOError: file not found\n'
+                          'ok\t/c.jpg\t/c.x')
+    assert batch2XML.readCheckpoint(str(checkpoint)) == set(['/a.jpg'])
+
+def test_batchResumesFromCheckpoint(tmp_path):
+    fileNames = makePages(str(tmp_path / 'in'), 3)
+    outputDir = str(tmp_path / 'out')
+    checkpointFile = str(tmp_path / 'checkpoint.tsv')
+
+    # the first run is cut short after one page
+    first = batch2XML.batch2XML(fileNames[:1], outputDir, workers=1, checkpointFile=checkpointFile)
+    assert [result[2] for result in first] == [True]
+
+    second = batch2XML.batch2XML(fileNames, outputDir, workers=1, checkpointFile=checkpointFile)
+    assert sorted(result[0] for result in second) == [os.path.abspath(name) for name in fileNames[1:]]
+    assert all(result[2] for result in second)
+    assert batch2XML.readCheckpoint(checkpointFile) == set(os.path.abspath(name) for name in fileNames)
+    for xmlFile in batch2XML.outputPaths(fileNames, outputDir):
+        assert os.path.isfile(xmlFile)
+        assert not os.path.exists(xmlFile + '.part')
+
+def test_batchWritesSidecarNextToFinalFile(tmp_path):
+    fileNames = makePages(str(tmp_path / 'in'), 1)
+    outputDir = str(tmp_path / 'out')
+    results = batch2XML.batch2XML(fileNames, outputDir, workers=1, sidecar=True)
+    assert results[0][2], results[0][4]
+    xmlFile = results[0][1]
+    blocksDir = os.path.splitext(xmlFile)[0] + '_blocks'
+    assert os.listdir(blocksDir)
+    assert 'src="page0_blocks/block0.jpg"' in open(xmlFile).read()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Tests of the SVHN ground truth index.
+"""
+
+import os
+
+import numpy
+
+import digitStruct
+from conftest import MINI_SVHN
+
+DIGIT_STRUCT = os.path.join(MINI_SVHN, 'digitStruct.mat')
+
+def test_selectGathersBoxesInTheOrderOfNames():
+    boxes = numpy.arange(6 * 4).reshape(6, 4)
+    groundTruth = digitStruct.GroundTruth(['a.png', 'b.png', 'c.png', 'd.png'], [0, 2, 2, 5, 6], boxes, [1, 2, 3, 4, 5, 6])
+    selected, imageIds = groundTruth.select(['c.png', 'b.png', 'a.png', 'c.png'])
+    assert (selected == boxes[[2, 3, 4, 0, 1, 2, 3, 4]]).all()
+    assert imageIds.tolist() == [0, 0, 0, 2, 2, 3, 3, 3]
+    assert (groundTruth.boxesOf('d.png') == boxes[5:]).all()
+    assert len(groundTruth.select([])[0]) == 0
+
+def test_indexIsCachedOutsideTheDataset(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    before = sorted(os.listdir(MINI_SVHN))
+    groundTruth = digitStruct.loadGroundTruth(DIGIT_STRUCT)
+    assert len(groundTruth) == 20
+    assert (groundTruth.boxesOf('1.png') == [[43, 7, 19, 30]]).all()
+    assert sorted(os.listdir(MINI_SVHN)) == before
+    assert os.listdir(str(tmp_path / 'crowdOHR')) == [os.path.basename(digitStruct.indexPath(DIGIT_STRUCT))]
+
+    # the second load reads the index
+    monkeypatch.setattr(digitStruct, 'readDigitStruct', None)
+    cached = digitStruct.loadGroundTruth(DIGIT_STRUCT)
+    assert (cached.names == groundTruth.names).all()
+    assert (cached.offsets == groundTruth.offsets).all()
+    assert (cached.boxes == groundTruth.boxes).all()
+    assert (cached.labels == groundTruth.labels).all()
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Tests of the SVHN evaluation against the simulated crowd.
+"""
+
+import os
+
+import image2XML
+import batch2XML
+import crowdServer
+import digitStruct
+import evaluateSVHN
+from conftest import MINI_SVHN
+
+def test_protocolsAreScoredOnDetectorAndCrowd(tmp_path):
+    fileNames = batch2XML.listImages(MINI_SVHN)[:4]
+    groundTruth = digitStruct.loadGroundTruth(os.path.join(MINI_SVHN, 'digitStruct.mat'), str(tmp_path))
+    simulator = crowdServer.CrowdSimulator(latency=0.05, jitter=0, secondsPerBlock=2, secondsPerPage=10)
+    report = evaluateSVHN.evaluate(fileNames, groundTruth, workers=1, simulator=simulator, batchSize=4, inFlight=2)
+
+    cpuBlocks = [image2XML.getBlocksByCV(image2XML.inputImage(name), **evaluateSVHN.SVHN_PARAMETERS) for name in fileNames]
+    blocks = sum(len(found) for found in cpuBlocks)
+    protocols = report['protocols']
+    assert protocols['CPU']['blocks'] == protocols['CPU+HPU']['blocks'] == blocks
+    assert protocols['CPU']['cost'] == 0.0
+    # every page is billed 10 seconds and 2 per block it was sent with
+    assert protocols['CPU+HPU']['humanSeconds'] == 10 * 4 + 2 * blocks
+    assert protocols['HPU']['humanSeconds'] == 10 * 4
+    assert report['crowd']['humanSeconds'] == 10 * 8 + 2 * blocks
+    assert report['crowd']['tasks'] == simulator.tasks >= 2
+    assert report['crowd']['pages'] == 8
+    assert protocols['HPU']['verified'] == 4
+    assert sorted(report['stages']) == sorted(evaluateSVHN.STAGES)
+    assert all(stage['runs'] == 4 for stage in report['stages'].values())
+    assert report['failedBlocks'] == blocks
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Tests of crowd dispatch against the simulated crowd: batching, billing,
+deadlines and failed tasks.
+"""
+
+import asyncio
+
+import numpy
+
+import hpu
+import image2XML
+import crowdServer
+import recognitionCache
+from conftest import SAMPLE_PAGE
+
+PAGE = numpy.full((32, 32, 3), 255, numpy.uint8)
+
+class MalformedCrowd(crowdServer.CrowdSimulator):
+    '''Answers one page of each task without its blocks'''
+
+    async def answer(self, task):
+        answer = await crowdServer.CrowdSimulator.answer(self, task)
+        del answer['pages'][-1]['blocks']
+        return answer
+
+def runWithCrowd(simulator, test, **options):
+    '''Runs test(dispatcher) against simulator served on a free port'''
+
+    async def run():
+        server = await crowdServer.startServer(simulator, port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            dispatcher = hpu.HPUDispatcher('http://127.0.0.1:{0}/'.format(port), **options)
+            result = await test(dispatcher)
+            await dispatcher.close()
+            return dispatcher, result
+        finally:
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(run())
+
+def test_pagesAreBatchedAndBilled():
+    simulator = crowdServer.CrowdSimulator(latency=0.05, jitter=0, secondsPerBlock=2, secondsPerPage=10)
+
+    async def test(dispatcher):
+        return await asyncio.gather(*[dispatcher.verify(PAGE, [(0, 0, 4, 4)] * i) for i in range(5)])
+
+    dispatcher, results = runWithCrowd(simulator, test, batchSize=2)
+    assert [result[2] for result in results] == [True] * 5
+    assert [result[1] for result in results] == [10 + 2 * i for i in range(5)]
+    assert results[3][0] == [(0, 0, 4, 4)] * 3
+    assert dispatcher.crowdTasks == simulator.tasks == 3
+    assert dispatcher.humanSeconds == sum(10 + 2 * i for i in range(5))
+    assert dispatcher.pages == 5
+
+def test_lateAnswersAreNotBilled():
+    simulator = crowdServer.CrowdSimulator(latency=0.3, jitter=0)
+
+    async def test(dispatcher):
+        return await dispatcher.verify(PAGE, [(1, 2, 3, 4)])
+
+    dispatcher, result = runWithCrowd(simulator, test, deadline=0.1)
+    assert result == ([(1, 2, 3, 4)], 0.0, False)
+    assert dispatcher.timeouts == 1
+    assert (dispatcher.humanSeconds, dispatcher.pages) == (0.0, 0)
+
+def test_deadlineCountsTheWaitForATaskSlot():
+    simulator = crowdServer.CrowdSimulator(latency=0.3, jitter=0)
+
+    async def test(dispatcher):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await asyncio.gather(dispatcher.verify(PAGE, []), dispatcher.verify(PAGE, []))
+        return results, loop.time() - start
+
+    # the second task waits 0.3 seconds for the only slot, so it cannot be
+    # answered within its 0.45 second deadline
+    dispatcher, (results, elapsed) = runWithCrowd(simulator, test, batchSize=1, maxTasks=1, deadline=0.45)
+    assert [result[2] for result in results] == [True, False]
+    assert elapsed < 0.55
+    assert dispatcher.pages == 1
+
+def test_malformedAnswerFailsTheWholeTask():
+    simulator = MalformedCrowd(latency=0.05, jitter=0)
+
+    async def test(dispatcher):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await asyncio.gather(*[dispatcher.verify(PAGE, [(0, 0, 1, 1)]) for i in range(3)])
+        return results, loop.time() - start
+
+    dispatcher, (results, elapsed) = runWithCrowd(simulator, test, batchSize=3, deadline=5)
+    # every page is returned unverified right away, not at its deadline
+    assert results == [([(0, 0, 1, 1)], 0.0, False)] * 3
+    assert elapsed < 1
+    assert dispatcher.failures == 1
+    assert dispatcher.humanSeconds == 0.0
+
+def test_unansweredPageKeepsItsCVBlocks(tmp_path):
+    simulator = crowdServer.CrowdSimulator(latency=1, jitter=0)
+    cache = recognitionCache.RecognitionCache(str(tmp_path / 'cache.db'), recognizerVersion=image2XML.RECOGNIZER_VERSION)
+
+    async def test(dispatcher):
+        results = await hpu.crowd2XML([SAMPLE_PAGE], str(tmp_path), dispatcher, workers=2, cache=cache)
+        return results
+
+    dispatcher, results = runWithCrowd(simulator, test, deadline=0.05)
+    assert results[0][1:] == (True, 0.0, False, '')
+    blockList, lines = image2XML.readXML(str(tmp_path / 'unprocessed1.xml'))
+    cvBlocks = image2XML.getBlocksByCV(image2XML.inputImage(SAMPLE_PAGE))
+    assert cvBlocks and cvBlocks != image2XML.getBlocksByHPU(None, [])
+    assert [tuple(block[0]) for block in blockList] == [tuple(block) for block in cvBlocks]
+    assert cache.stats()['misses'] == len(blockList)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Tests of block recognition: shared block pools and failing blocks.
+"""
+
+import os
+import time
+import multiprocessing
+
+import cv2
+import pytest
+
+import image2XML
+from conftest import SAMPLE_PAGE, sameBlocks
+
+# a block the test values of recognizeBlock do not know
+UNKNOWN_BLOCK = (10, 10, 30, 30)
+
+def samplePage():
+    return cv2.imread(SAMPLE_PAGE)
+
+def sampleBlocks():
+    return image2XML.getBlocksByHPU(None, [])
+
+def test_sharedPoolKeepsBlockOrder():
+    image = samplePage()
+    blocks = sampleBlocks()
+    expected = image2XML.processBlockList(blocks, image)
+    with image2XML.BlockPool(3) as pool:
+        # the same pool serves several pages
+        for i in range(2):
+            assert sameBlocks(image2XML.processBlockList(blocks, image, pool=pool), expected)
+
+def test_failingBlockDoesNotStopTheOthers():
+    image = samplePage()
+    blocks = sampleBlocks()
+    blocks.insert(2, UNKNOWN_BLOCK)
+    errors = []
+    blockList = image2XML.processBlockList(blocks, image, workers=2, errors=errors)
+    assert [block[0] for block in blockList] == blocks
+    assert blockList[2][1] == (False, '')
+    assert [error[0] for error in errors] == [2]
+    assert errors[0][1].startswith('KeyError')
+
+def test_saveXMLWithoutFileWritesXMLToStandardOutput(capsys, tmp_path):
+    image = samplePage()
+    blockList = image2XML.processBlockList(sampleBlocks(), image)
+    image2XML.saveXML(blockList)
+    printed = capsys.readouterr().out
+    fileName = str(tmp_path / 'page.xml')
+    image2XML.saveXML(blockList, fileName)
+    with open(fileName) as xmlFile:
+        assert printed == xmlFile.read()
+
+def dieOnUnknownBlock(recognizeBlock):
+    def recognize(blockDimensions, block):
+        if blockDimensions == UNKNOWN_BLOCK:
+            os._exit(1)
+        return recognizeBlock(blockDimensions, block)
+    return recognize
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='workers must inherit the patched recognizer')
+def test_workerDeathFailsOnlyItsBlock(monkeypatch):
+    monkeypatch.setattr(image2XML, 'recognizeBlock', dieOnUnknownBlock(image2XML.recognizeBlock))
+    image = samplePage()
+    blocks = sampleBlocks()
+    blocks.insert(3, UNKNOWN_BLOCK)
+    expected = image2XML.processBlockList(sampleBlocks(), image)
+    errors = []
+    with image2XML.BlockPool(2, processes=True) as pool:
+        blockList = image2XML.processBlockList(blocks, image, errors=errors, pool=pool)
+        assert [error[0] for error in errors] == [3]
+        assert 'BrokenProcessPool' in errors[0][1]
+        assert blockList[3] == (UNKNOWN_BLOCK, (False, ''))
+        assert sameBlocks(blockList[:3] + blockList[4:], expected)
+        # the pool was renewed and still serves the next page
+        assert sameBlocks(image2XML.processBlockList(sampleBlocks(), image, pool=pool), expected)
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='workers must inherit the patched recognizer')
+def test_finishedBlocksAreNotRecognizedAgain(monkeypatch, tmp_path):
+    logFile = str(tmp_path / 'recognized.txt')
+    recognizeBlock = image2XML.recognizeBlock
+
+    def recognize(blockDimensions, block):
+        if blockDimensions == UNKNOWN_BLOCK:
+            # the blocks submitted with this one finish before its worker dies
+            time.sleep(0.5)
+            os._exit(1)
+        with open(logFile, 'a') as log:
+            log.write('{0}\n'.format(blockDimensions))
+        return recognizeBlock(blockDimensions, block)
+
+    monkeypatch.setattr(image2XML, 'recognizeBlock', recognize)
+    blocks = sampleBlocks()
+    blocks.insert(3, UNKNOWN_BLOCK)
+    with image2XML.BlockPool(2, processes=True) as pool:
+        image2XML.processBlockList(blocks, samplePage(), errors=[], pool=pool)
+    with open(logFile) as log:
+        recognized = log.read().splitlines()
+    assert sorted(recognized) == sorted(str(block) for block in sampleBlocks())
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Tests of the conversion service and the convert() entry point it uses.
+"""
+
+import io
+import socket
+import pathlib
+import threading
+import http.client
+
+import pytest
+
+import image2XML
+import image2XMLServer
+from conftest import SAMPLE_PAGE, sameBlocks
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        http.client.HTTPConnection.__init__(self, 'localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+def test_convertAcceptsPathLike():
+    assert sameBlocks(image2XML.convert(pathlib.Path(SAMPLE_PAGE)), image2XML.convert(SAMPLE_PAGE))
+
+def test_unixServerRefusesToReplaceRegularFile(tmp_path):
+    path = tmp_path / 'page.xml'
+    path.write_text('keep me')
+    with pytest.raises(IOError):
+        image2XMLServer.UnixHTTPServer(str(path), image2XMLServer.ConvertHandler)
+    assert path.read_text() == 'keep me'
+
+def test_unixServerReplacesStaleSocket(tmp_path):
+    path = str(tmp_path / 'server.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+
+    server = image2XMLServer.UnixHTTPServer(path, image2XMLServer.ConvertHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        connection = UnixHTTPConnection(path)
+        with open(SAMPLE_PAGE, 'rb') as imageFile:
+            connection.request('POST', '/', imageFile.read())
+        response = connection.getresponse()
+        body = response.read().decode('utf-8')
+        assert response.status == 200
+        assert body.startswith('<?xml version="1.0"?>\n<blocks>\n')
+        assert body.endswith('</blocks>\n')
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+def serveOnSocket(path):
+    server = image2XMLServer.UnixHTTPServer(path, image2XMLServer.ConvertHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    return server, thread
+
+def stopServing(server, thread):
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+def test_responseIsStreamedInChunks(tmp_path):
+    path = str(tmp_path / 'server.sock')
+    server, thread = serveOnSocket(path)
+    try:
+        with open(SAMPLE_PAGE, 'rb') as imageFile:
+            data = imageFile.read()
+        expected = io.StringIO()
+        image2XML.writeXML(image2XML.convert(data), expected)
+
+        connection = UnixHTTPConnection(path)
+        # the connection is kept open between requests
+        for i in range(2):
+            connection.request('POST', '/', data)
+            response = connection.getresponse()
+            assert response.status == 200
+            assert response.getheader('Transfer-Encoding') == 'chunked'
+            assert response.getheader('Content-Length') is None
+            assert response.read().decode('utf-8') == expected.getvalue()
+        connection.close()
+    finally:
+        stopServing(server, thread)
+
+def test_http10ResponseEndsWithTheConnection(tmp_path):
+    path = str(tmp_path / 'server.sock')
+    server, thread = serveOnSocket(path)
+    try:
+        with open(SAMPLE_PAGE, 'rb') as imageFile:
+            data = imageFile.read()
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(path)
+        client.sendall('POST / HTTP/1.0\r\nContent-Length: {0}\r\n\r\n'.format(len(data)).encode('ascii') + data)
+        reply = b''
+        while True:
+            received = client.recv(65536)
+            if not received:
+                break
+            reply += received
+        client.close()
+        head, body = reply.split(b'\r\n\r\n', 1)
+        assert head.startswith(b'HTTP/1.1 200')
+        assert b'chunked' not in head
+        assert body.startswith(b'<?xml') and body.endswith(b'</blocks>\n')
+    finally:
+        stopServing(server, thread)
+
+def test_badImageIsRejectedBeforeStreaming(tmp_path):
+    path = str(tmp_path / 'server.sock')
+    server, thread = serveOnSocket(path)
+    try:
+        connection = UnixHTTPConnection(path)
+        connection.request('POST', '/', b'not an image')
+        response = connection.getresponse()
+        assert response.status == 400
+        assert response.read() == b'cannot decode image data\n'
+    finally:
+        stopServing(server, thread)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Tests of incremental updates: block matching and patching of XML files.
+"""
+
+import os
+import base64
+
+import cv2
+import numpy
+
+import image2XML
+import incremental
+from conftest import SAMPLE_PAGE
+
+# a block the test values of recognizeBlock do not know
+UNKNOWN_BLOCK = (10, 10, 30, 30)
+
+def sampleBlocks():
+    return image2XML.getBlocksByHPU(None, [])
+
+def writeSample(fileName, sidecar=False):
+    image = cv2.imread(SAMPLE_PAGE)
+    image2XML.saveXML(image2XML.processBlockList(sampleBlocks(), image), fileName, sidecar)
+
+def readLines(fileName):
+    with open(fileName) as xmlFile:
+        return xmlFile.readlines()
+
+def test_matchBlocksPrefersIdenticalBoxes():
+    old = [(0, 0, 100, 100), (0, 0, 100, 100), (200, 0, 100, 100), (400, 0, 100, 100)]
+    new = [(400, 0, 100, 100), (201, 0, 100, 100), (0, 0, 100, 100), (0, 0, 100, 100), (600, 0, 10, 10)]
+    assert incremental.matchBlocks(old, new) == [3, 2, 0, 1, None]
+
+def test_matchBlocksTakesBestOverlapAboveThreshold():
+    old = [(0, 0, 100, 100), (3, 0, 100, 100)]
+    # IoU 0.96 with the second old block, 0.90 with the first
+    new = [(4, 0, 100, 100), (10, 0, 100, 100)]
+    assert incremental.matchBlocks(old, new) == [1, None]
+    assert incremental.matchBlocks(old, new, threshold=0.8) == [1, 0]
+    assert incremental.matchBlocks([], new) == [None, None]
+
+def test_unchangedBlocksAreCopiedWithoutDecoding(tmp_path):
+    fileName = str(tmp_path / 'page.xml')
+    writeSample(fileName)
+    before = readLines(fileName)
+    blocks = sampleBlocks()
+    blocks.reverse()
+    # the image file is never opened when every block is kept
+    recognized, rewritten = incremental.updateXML(str(tmp_path / 'missing.jpg'), fileName, blocks)
+    assert (recognized, rewritten) == (0, 0)
+    after = readLines(fileName)
+    assert len(after) == len(before)
+    assert [line.split('left=')[1] for line in after[2:-1]] == [line.split('left=')[1] for line in reversed(before[2:-1])]
+    assert after[2].startswith('<block index="0"')
+
+def test_failedNewBlockIsReported(tmp_path):
+    fileName = str(tmp_path / 'page.xml')
+    writeSample(fileName)
+    before = readLines(fileName)
+    blocks = sampleBlocks() + [UNKNOWN_BLOCK]
+    errors = []
+    recognized, rewritten = incremental.updateXML(SAMPLE_PAGE, fileName, blocks, errors=errors)
+    assert (recognized, rewritten) == (1, 1)
+    assert [error[0] for error in errors] == [8]
+    assert errors[0][1].startswith('KeyError')
+    after = readLines(fileName)
+    assert after[2:-2] == before[2:-1]
+    assert after[-2] == '<block index="8" left="10" top="10" width="30" height="30" isImage="False" data=""/>\n'
+
+def test_resizedSidecarImageBlockIsCutAgain(tmp_path):
+    fileName = str(tmp_path / 'page.xml')
+    writeSample(fileName, sidecar=True)
+    blocks = sampleBlocks()
+    blocks[0] = (292, 23, 160, 124)
+    recognized, rewritten = incremental.updateXML(SAMPLE_PAGE, fileName, blocks)
+    assert (recognized, rewritten) == (0, 1)
+
+    line = readLines(fileName)[2]
+    assert line == '<block index="0" left="292" top="23" width="160" height="124" isImage="True" src="page_blocks/block0.jpg"/>\n'
+    saved = cv2.imread(str(tmp_path / 'page_blocks' / 'block0.jpg'))
+    expected = image2XML.cropImage(blocks[0], cv2.imread(SAMPLE_PAGE))
+    assert saved.shape == expected.shape
+    assert numpy.abs(saved.astype(int) - expected).mean() < 8
+
+def test_resizedInlineImageBlockIsCutAgain(tmp_path):
+    fileName = str(tmp_path / 'page.xml')
+    writeSample(fileName)
+    blocks = sampleBlocks()
+    blocks[6] = (394, 909, 260, 85)
+    incremental.updateXML(SAMPLE_PAGE, fileName, blocks)
+    blockList, lines = image2XML.readXML(fileName)
+    assert 'src=' not in lines[6]
+    jpeg = numpy.frombuffer(base64.b64decode(blockList[6][1][1]), numpy.uint8)
+    assert cv2.imdecode(jpeg, cv2.IMREAD_COLOR).shape == (85, 260, 3)
+
+def test_sidecarFilesOfCopiedLinesAreNotOverwritten(tmp_path):
+    fileName = str(tmp_path / 'page.xml')
+    writeSample(fileName, sidecar=True)
+    directory = tmp_path / 'page_blocks'
+    kept = (directory / 'block6.jpg').read_bytes()
+    old = sampleBlocks()
+    # the image block of old index 6 moves to index 5 and keeps its line and
+    # file; the resized image block of old index 0 is written at index 6
+    blocks = old[1:7] + [(292, 23, 160, 124)] + old[7:]
+    incremental.updateXML(SAMPLE_PAGE, fileName, blocks)
+
+    lines = readLines(fileName)
+    assert 'src="page_blocks/block6.jpg"' in lines[2 + 5]
+    assert 'src="page_blocks/block6_1.jpg"' in lines[2 + 6]
+    assert (directory / 'block6.jpg').read_bytes() == kept
+    assert cv2.imread(str(directory / 'block6_1.jpg')).shape == (124, 160, 3)
+    # the file of the old block 0 is not referred to any more
+    assert sorted(os.listdir(str(directory))) == ['block6.jpg', 'block6_1.jpg']
+
+def test_inliningRemovesSidecarFilesOfReplacedBlocks(tmp_path):
+    fileName = str(tmp_path / 'page.xml')
+    writeSample(fileName, sidecar=True)
+    blocks = sampleBlocks()
+    # the image block of index 0 is resized, the one of index 6 is dropped
+    blocks[0] = (292, 23, 160, 124)
+    del blocks[6]
+    incremental.updateXML(SAMPLE_PAGE, fileName, blocks, sidecar=False)
+
+    lines = readLines(fileName)
+    assert 'src=' not in lines[2] and 'data="' in lines[2]
+    assert not (tmp_path / 'page_blocks').exists()
+
+def test_keptSidecarFilesSurviveInlining(tmp_path):
+    fileName = str(tmp_path / 'page.xml')
+    writeSample(fileName, sidecar=True)
+    blocks = sampleBlocks()
+    blocks[0] = (292, 23, 160, 124)
+    incremental.updateXML(SAMPLE_PAGE, fileName, blocks, sidecar=False)
+    # the unchanged image block keeps its copied line and its file
+    assert 'src="page_blocks/block6.jpg"' in readLines(fileName)[2 + 6]
+    assert os.listdir(str(tmp_path / 'page_blocks')) == ['block6.jpg']
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Tests of the persistent recognition cache: hits, misses, batched counts,
+sizes and eviction.
+"""
+
+import os
+import pickle
+import sqlite3
+
+import numpy
+
+import recognitionCache
+
+def totals(fileName):
+    connection = sqlite3.connect(fileName)
+    try:
+        return connection.execute('SELECT size, hits, misses, evictions FROM totals').fetchone()
+    finally:
+        connection.close()
+
+def test_hitAndMiss(tmp_path):
+    cache = recognitionCache.RecognitionCache(str(tmp_path / 'cache.db'))
+    assert cache.get('a') is None
+    cache.put('a', (False, 'text'))
+    assert cache.get('a') == (False, 'text')
+    cache.put('b', (True, ''))
+    assert cache.get('b') == (True, '')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (2, 1)
+    assert stats['total'] == {'hits': 2, 'misses': 1, 'evictions': 0}
+    assert stats['entries'] == 2
+    cache.close()
+
+def test_keyDependsOnPixelsAndVersion(tmp_path):
+    fileName = str(tmp_path / 'cache.db')
+    image = numpy.arange(300, dtype=numpy.uint8).reshape(10, 10, 3)
+    cache = recognitionCache.RecognitionCache(fileName, recognizerVersion='1')
+    # a non contiguous crop hashes like its contiguous copy
+    assert cache.key(image[2:5, 3:7]) == cache.key(numpy.ascontiguousarray(image[2:5, 3:7]))
+    assert cache.key(image[2:5, 3:7]) != cache.key(image[2:5, 4:8])
+    assert cache.key(image) != recognitionCache.RecognitionCache(fileName, recognizerVersion='2').key(image)
+
+def test_lookupsAreCountedInMemoryUntilFlushed(tmp_path):
+    fileName = str(tmp_path / 'cache.db')
+    cache = recognitionCache.RecognitionCache(fileName)
+    cache.put('a', (False, 'text'))
+    for i in range(recognitionCache.FLUSH_OPERATIONS - 2):
+        cache.get('a')
+    cache.get('missing')
+    assert totals(fileName)[1:3] == (0, 0)
+    # the lookup that reaches FLUSH_OPERATIONS writes them all
+    cache.get('missing')
+    assert totals(fileName)[1:3] == (recognitionCache.FLUSH_OPERATIONS - 2, 2)
+    cache.get('a')
+    cache.close()
+    assert totals(fileName)[1:3] == (recognitionCache.FLUSH_OPERATIONS - 1, 2)
+
+def test_sizeCountsEncodedBytes(tmp_path):
+    cache = recognitionCache.RecognitionCache(str(tmp_path / 'cache.db'))
+    cache.put('a', (False, u'été'))
+    assert cache.stats()['bytes'] == 5
+    cache.put('a', (False, u'€'))
+    assert cache.stats()['bytes'] == 3
+
+def test_leastRecentlyUsedIsEvicted(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(recognitionCache.time, 'time', lambda: clock[0])
+
+    def tick():
+        clock[0] += 1
+        return clock[0]
+
+    fileName = str(tmp_path / 'cache.db')
+    cache = recognitionCache.RecognitionCache(fileName, maxBytes=30)
+    for key in 'abc':
+        tick()
+        cache.put(key, (False, key * 10))
+    # a hit makes 'a' the most recently used; the pending time is written
+    # by the next put before it evicts
+    tick()
+    assert cache.get('a') == (False, 'a' * 10)
+    tick()
+    cache.put('d', (False, 'd' * 10))
+
+    assert cache.get('b') is None
+    for key in 'acd':
+        assert cache.get(key) == (False, key * 10)
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['total']['evictions'] == 1
+    assert (stats['entries'], stats['bytes']) == (3, 30)
+    cache.close()
+    assert totals(fileName) == (30, 4, 1, 1)
+
+def test_copiesShareCountsOfTheirProcess(tmp_path):
+    fileName = str(tmp_path / 'cache.db')
+    cache = recognitionCache.RecognitionCache(fileName)
+    copy = pickle.loads(pickle.dumps(cache))
+    copy.get('a')
+    assert copy.stats()['misses'] == 1
+    assert cache.stats()['total']['misses'] == 1
+    assert os.path.isfile(fileName)
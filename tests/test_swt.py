@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Tests of the stroke width transform text detector.
+"""
+
+import cv2
+import numpy
+
+import swt
+
+def digits(text='37'):
+    image = numpy.full((120, 200, 3), 255, numpy.uint8)
+    cv2.putText(image, text, (40, 95), cv2.FONT_HERSHEY_SIMPLEX, 2.5, (0, 0, 0), 8)
+    return image
+
+def test_strokeWidthOfBarIsItsWidth():
+    bar = numpy.full((100, 100), 255, numpy.uint8)
+    bar[20:80, 40:50] = 0
+    widths = swt.strokeWidthTransform(bar, darkOnLight=True)
+    stroke = widths[widths > 0]
+    assert stroke.size
+    assert numpy.median(stroke) == 10
+    assert stroke.min() >= 9 and stroke.max() <= 10
+    # nothing outside the bar
+    assert (widths[:, :38] < 0).all() and (widths[:, 52:] < 0).all()
+
+def test_perCharacterDetectionFindsEachDigit():
+    blocks = swt.detectTextBlocks(digits(), darkOnLight=True, morphologyOpenRadius=0, morphologyCloseRadius=0)
+    assert len(blocks) == 2
+    for left, top, width, height in blocks:
+        assert 40 <= left and left + width <= 140
+        assert 30 <= top and top + height <= 100
+
+def test_defaultPolarityIsLightTextOnDark():
+    # chen2011.m defaults to LightTextOnDark, so dark digits are only found
+    # as digits once the polarity is given
+    image = digits()
+    assert swt.detectTextBlocks(255 - image, morphologyOpenRadius=0, morphologyCloseRadius=0) == \
+        swt.detectTextBlocks(image, darkOnLight=True, morphologyOpenRadius=0, morphologyCloseRadius=0)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Tests of memory-mapped input and tiled block detection.
+"""
+
+import os
+
+import cv2
+import numpy
+
+import image2XML
+import tiledInput
+from conftest import SAMPLE_PAGE
+
+def writeNetpbm(fileName, image, comment=b''):
+    kind = b'P5' if image.ndim == 2 else b'P6'
+    pixels = image if image.ndim == 2 else image[:, :, ::-1]
+    with open(fileName, 'wb') as imageFile:
+        imageFile.write(kind + b'\n# ' + comment + b'\n' + '{0} {1}\n255\n'.format(image.shape[1], image.shape[0]).encode('ascii'))
+        imageFile.write(numpy.ascontiguousarray(pixels).tobytes())
+
+def detectDark(tile):
+    '''Finds one box around the dark pixels of a tile'''
+
+    gray = tile if tile.ndim == 2 else cv2.cvtColor(tile, cv2.COLOR_BGR2GRAY)
+    points = cv2.findNonZero((gray < 128).astype(numpy.uint8))
+    return [] if points is None else [cv2.boundingRect(points)]
+
+def test_longNetpbmCommentsAreSkipped(tmp_path):
+    page = cv2.imread(SAMPLE_PAGE)
+    fileName = str(tmp_path / 'page.ppm')
+    writeNetpbm(fileName, page, b'x' * 2000)
+    image = tiledInput.openImage(fileName, str(tmp_path))
+    assert (image == page).all()
+    assert not image.flags.writeable
+    # BGR rows with positive strides, which cv2 reads without a copy
+    assert image.flags.c_contiguous
+    assert os.listdir(str(tmp_path)) == ['page.ppm']
+
+def test_pgmIsMappedInPlace(tmp_path):
+    page = cv2.cvtColor(cv2.imread(SAMPLE_PAGE), cv2.COLOR_BGR2GRAY)
+    fileName = str(tmp_path / 'page.pgm')
+    writeNetpbm(fileName, page, b'#' * 600)
+    image = tiledInput.openImage(fileName)
+    assert (image == page).all()
+    assert isinstance(image.base, numpy.memmap) and image.base.filename == os.path.abspath(fileName)
+
+def test_compressedPageIsDecodedIntoMapping(tmp_path):
+    image = tiledInput.openImage(SAMPLE_PAGE, str(tmp_path))
+    assert (image == cv2.imread(SAMPLE_PAGE)).all()
+    assert image.source == SAMPLE_PAGE
+    assert tiledInput.imageSize(SAMPLE_PAGE) == (739, 1024)
+    assert os.listdir(str(tmp_path)) == []
+    # the coarse level is decoded at reduced size, slices do not carry the source
+    assert tiledInput.pyramidLevel(image, 4).shape == (256, 185, 3)
+    assert image[:100].source is None
+    assert tiledInput.pyramidLevel(image[:100], 4).shape == (25, 184, 3)
+
+def test_mergeSeamsJoinsPartsFromDifferentTiles():
+    boxes = [(90, 10, 20, 10), (100, 10, 30, 10), (0, 0, 5, 5), (2, 2, 5, 5), (300, 300, 5, 5)]
+    tiles = [0, 1, 0, 0, 1]
+    # boxes of one tile are kept apart even where they overlap
+    assert tiledInput.mergeSeams(boxes, tiles) == [(0, 0, 5, 5), (2, 2, 5, 5), (90, 10, 40, 10), (300, 300, 5, 5)]
+    assert tiledInput.mergeSeams([], []) == []
+
+def test_blockCrossingTileBordersIsFoundOnce():
+    image = numpy.full((200, 200), 255, numpy.uint8)
+    image[50:120, 40:150] = 0
+    # the block spans four tiles of 100 pixels
+    blocks = tiledInput.detectBlocksTiled(image, tileSize=100, overlap=20, factor=1, detect=detectDark)
+    assert blocks == [(40, 50, 110, 70)]
+    blocks = tiledInput.detectBlocksTiled(image, tileSize=100, overlap=20, factor=2, detect=detectDark)
+    assert blocks == [(40, 50, 110, 70)]
+
+def test_pagesLargerThanATileAreSearchedInTiles(monkeypatch):
+    calls = []
+    monkeypatch.setattr(tiledInput, 'detectBlocksTiled', lambda image, detect: calls.append(image.shape) or [])
+    monkeypatch.setattr(image2XML.swt, 'detectTextBlocks', lambda image, **settings: [])
+    image2XML.getBlocksByCV(numpy.zeros((tiledInput.TILE_SIZE, tiledInput.TILE_SIZE), numpy.uint8))
+    assert calls == []
+    image2XML.getBlocksByCV(numpy.zeros((tiledInput.TILE_SIZE + 1, tiledInput.TILE_SIZE), numpy.uint8))
+    assert calls == [(tiledInput.TILE_SIZE + 1, tiledInput.TILE_SIZE)]
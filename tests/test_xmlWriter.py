@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+The program is distributed under the terms of the GNU General Public License version 3
+which can be found in the root directory and at http://www.gnu.org/licenses/gpl-3.0.txt
+
+Copyright 2015 Ayush Sagar
+
+Tests of the streaming XML writer and of reading its output back.
+"""
+
+import base64
+import xml.dom.minidom
+
+import cv2
+import numpy
+
+import image2XML
+import xmlWriter
+from conftest import SAMPLE_PAGE
+
+def test_escapeAttributeRoundTrip():
+    text = u'a < b & "c" > d\n\té\r &amp; &#10;'
+    escaped = xmlWriter.escapeAttribute(text)
+    assert not set('<>"\n\r\t') & set(escaped)
+    assert xmlWriter.unescapeAttribute(escaped) == text
+
+def test_escapedTextSurvivesAnXMLParser(tmp_path):
+    text = u'line one\nline "two" & <three>\t'
+    fileName = str(tmp_path / 'page.xml')
+    image2XML.saveXML([((1, 2, 3, 4), (False, text))], fileName)
+    block = xml.dom.minidom.parse(fileName).getElementsByTagName('block')[0]
+    assert block.getAttribute('data') == text
+    assert image2XML.readXML(fileName)[0] == [((1, 2, 3, 4), (False, text))]
+
+def test_recognizedImageBlocksAreCropViews():
+    image = cv2.imread(SAMPLE_PAGE)
+    for blockDimensions, (isImage, data) in image2XML.processBlockList(image2XML.getBlocksByHPU(image, []), image):
+        if isImage:
+            assert isinstance(data, numpy.ndarray)
+            assert numpy.shares_memory(data, image)
+            assert (data == image2XML.cropImage(blockDimensions, image)).all()
+
+def test_ndarrayBlockRoundTrip(tmp_path):
+    image = cv2.imread(SAMPLE_PAGE)
+    # a block larger than one base64 chunk once encoded, cut from inside the
+    # page so the view is not contiguous
+    blockDimensions = (10, 10, 700, 1000)
+    block = image2XML.cropImage(blockDimensions, image)
+    assert not block.flags.c_contiguous
+    fileName = str(tmp_path / 'page.xml')
+    image2XML.saveXML([((1, 2, 3, 4), (False, 'text')), (blockDimensions, (True, block))], fileName)
+
+    blockList, lines = image2XML.readXML(fileName)
+    assert blockList[0] == ((1, 2, 3, 4), (False, 'text'))
+    assert blockList[1][0] == blockDimensions
+    isImage, data = blockList[1][1]
+    assert isImage
+    jpeg = base64.b64decode(data, validate=True)
+    assert len(jpeg) > xmlWriter.BASE64_CHUNK
+    assert jpeg == xmlWriter.encodeImage(block).tobytes()
+    decoded = cv2.imdecode(numpy.frombuffer(jpeg, numpy.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == block.shape
+    assert numpy.abs(decoded.astype(int) - block).mean() < 8
+
+def test_ndarrayBlockToSidecar(tmp_path):
+    image = cv2.imread(SAMPLE_PAGE)
+    block = image2XML.cropImage((290, 23, 164, 124), image)
+    fileName = str(tmp_path / 'page.xml')
+    image2XML.saveXML([((290, 23, 164, 124), (True, block))], fileName, sidecar=True)
+    blockList, lines = image2XML.readXML(fileName)
+    assert blockList == [((290, 23, 164, 124), (True, 'page_blocks/block0.jpg'))]
+    saved = cv2.imread(str(tmp_path / 'page_blocks' / 'block0.jpg'))
+    assert saved.shape == block.shape